@@ -0,0 +1,595 @@
+## @file
+#  Vectorized algorithms for the Lidar data analysis.
+#  All functions work on the last axis of their array arguments, so that
+#  they accept a single profile as well as a stack of profiles.
+#
+
+import math
+import numpy
+
+## Minimum Tau4 for WL1 and WL2 for a run to be good
+TAU4_MIN=(0.002, 0.01)
+
+## Background estimators of estimateBackground
+BKG_METHODS=('mean', 'median', 'sigmaclip', 'linear')
+
+## Policies of logPower for the samples without a positive power
+LNPOWER_POLICIES=('mask', 'floor', 'drop')
+## Default policy of logPower, drop keeps the PW and LnPW averages of a bin
+#  over the same samples
+DEFAULT_LNPOWER_POLICY='drop'
+
+## Maximum number of alpha values computed at once by klettSweep
+SWEEP_MAX_ELEMENTS=2**22
+
+####################################
+## @brief Index range of the samples in an altitude window
+#
+## @param altitude
+#  altitude array sorted in increasing order
+## @param altMin
+#  lower bound of the window, excluded
+## @param altMax
+#  upper bound of the window, included
+## @return
+#  a tuple (first, last) to be used as a slice
+def windowIndices(altitude, altMin, altMax):
+    (first, last)=numpy.searchsorted(altitude, (altMin, altMax), side='right')
+    return (int(first), int(last))
+
+####################################
+## @brief Indices of the samples in several altitude windows
+#
+## @param altitude
+#  altitude array sorted in increasing order
+## @param windows
+#  a list of (altMin, altMax) windows, or a single window
+## @return
+#  sorted array of indices, each sample is counted once
+def backgroundIndices(altitude, windows):
+    windows=numpy.asarray(windows, dtype='d').reshape((-1, 2))
+    bounds=[windowIndices(altitude, altMin, altMax) for (altMin, altMax) in windows]
+    if len(bounds)==1:
+        return numpy.arange(*bounds[0])
+    return numpy.unique(numpy.concatenate([numpy.arange(*b) for b in bounds]))
+
+####################################
+## @brief Mean and standard deviation after iterative sigma clipping
+#
+## @param values
+#  samples, shape (..., N)
+## @param nSigma
+#  samples further than nSigma standard deviations from the mean are rejected
+## @param nIterations
+#  maximum number of iterations
+## @return
+#  a tuple (mean, standard deviation) with shape (...)
+def sigmaClippedMean(values, nSigma=3., nIterations=5):
+    values=numpy.asarray(values, dtype='d')
+    kept=numpy.ones(values.shape, dtype=bool)
+    for i in range(nIterations):
+        n=numpy.maximum(kept.sum(axis=-1), 1)
+        mean=numpy.where(kept, values, 0.).sum(axis=-1)/n
+        deviation=values-mean[...,numpy.newaxis]
+        sigma=numpy.sqrt(numpy.where(kept, deviation**2, 0.).sum(axis=-1)/n)
+        newKept=abs(deviation)<=nSigma*sigma[...,numpy.newaxis]
+        if numpy.array_equal(newKept, kept):
+            break
+        kept=newKept
+    return (mean, sigma)
+
+####################################
+## @brief Least squares linear trend of a stack of samples
+#
+## @param altitude
+#  altitude of the samples, shape (N)
+## @param samples
+#  samples, shape (..., N)
+## @return
+#  a tuple (level at the mean altitude, slope, residuals around the trend)
+def linearTrend(altitude, samples):
+    if samples.shape[-1]<2:
+        raise ValueError('A linear background needs at least two samples')
+    x=altitude-altitude.mean()
+    level=samples.mean(axis=-1)
+    residuals=samples-level[...,numpy.newaxis]
+    slope=numpy.dot(residuals, x)/numpy.dot(x, x)
+    residuals-=slope[...,numpy.newaxis]*x
+    return (level, slope, residuals)
+
+####################################
+## @brief Background of a stack of profiles
+#
+#  The samples of all windows are used together. The estimators are the
+#  mean, the median, the sigma clipped mean and a linear trend in altitude
+#  fitted by least squares. The level of the linear trend is its value at
+#  the mean altitude of the samples, and the trend is extrapolated to
+#  other altitudes.
+#
+## @param altitude
+#  altitude array sorted in increasing order, shape (N)
+## @param signal
+#  raw profiles, shape (..., N)
+## @param windows
+#  a list of (altMin, altMax) windows, or a single window
+## @param method
+#  one of BKG_METHODS
+## @param at
+#  altitudes where the background is subtracted, None for the level only
+## @param nSigma
+#  clipping threshold for the sigmaclip method
+## @return
+#  the background level with shape (...), or if at is given a tuple
+#  (level, background at these altitudes broadcastable to (..., len(at)))
+def estimateBackground(altitude, signal, windows=(20., 25.), method='mean', at=None,\
+                       nSigma=3.):
+    indices=backgroundIndices(altitude, windows)
+    if indices.size==0:
+        raise ValueError('No sample in the background windows %s'%str(windows))
+    if indices[-1]-indices[0]+1==indices.size:
+        # a slice for contiguous windows, no copy
+        indices=slice(indices[0], indices[-1]+1)
+    samples=signal[...,indices]
+    slope=None
+    if method=='mean':
+        level=samples.mean(axis=-1)
+    elif method=='median':
+        level=numpy.median(samples, axis=-1)
+    elif method=='sigmaclip':
+        level=sigmaClippedMean(samples, nSigma)[0]
+    elif method=='linear':
+        (level, slope)=linearTrend(altitude[indices], samples)[:2]
+    else:
+        raise ValueError('Unknown background method %s, use one of %s'%(method, BKG_METHODS))
+    if at is None:
+        return level
+    if slope is None:
+        return (level, level[...,numpy.newaxis])
+    reference=altitude[indices].mean()
+    return (level, level[...,numpy.newaxis]+\
+            slope[...,numpy.newaxis]*(numpy.asarray(at, dtype='d')-reference))
+
+####################################
+## @brief Noise of a stack of profiles around their background
+#
+#  The noise is measured the way estimateBackground gets the background:
+#  the standard deviation of the samples for the mean and the median, the
+#  clipped standard deviation for sigmaclip and the standard deviation of
+#  the residuals around the fitted trend for linear.
+#
+## @param altitude
+#  altitude array sorted in increasing order, shape (N)
+## @param signal
+#  raw profiles, shape (..., N)
+## @param windows
+#  a list of (altMin, altMax) windows, or a single window
+## @param method
+#  one of BKG_METHODS
+## @param nSigma
+#  clipping threshold for the sigmaclip method
+## @return
+#  a tuple (noise with shape (...), number of background samples)
+def backgroundNoise(altitude, signal, windows=(20., 25.), method='mean', nSigma=3.):
+    indices=backgroundIndices(altitude, windows)
+    if indices.size<2:
+        raise ValueError('The noise needs at least two samples in %s'%str(windows))
+    samples=signal[...,indices]
+    if method in ('mean', 'median'):
+        sigma=samples.std(axis=-1, ddof=1)
+    elif method=='sigmaclip':
+        sigma=sigmaClippedMean(samples, nSigma)[1]
+    elif method=='linear':
+        residuals=linearTrend(altitude[indices], samples)[2]
+        # two parameters fitted
+        sigma=numpy.sqrt((residuals**2).sum(axis=-1)/max(indices.size-2, 1))
+    else:
+        raise ValueError('Unknown background method %s, use one of %s'%(method, BKG_METHODS))
+    return (sigma, indices.size)
+
+####################################
+## @brief Log spaced altitude bin edges
+#
+## @param altMin
+#  lower edge of the first bin
+## @param altMax
+#  upper edge of the last bin
+## @param nBins
+#  number of bins
+def logBinEdges(altMin, altMax, nBins):
+    # same rounding as the original binning loop, so that points sitting
+    # on an edge stay in the same bin
+    width=(math.log(altMax)-math.log(altMin))/nBins
+    return numpy.array([math.exp(math.log(altMin)+i*width) for i in range(nBins+1)], 'd')
+
+####################################
+## @brief Linearly spaced altitude bin edges
+#
+## @param altMin
+#  lower edge of the first bin
+## @param altMax
+#  upper edge of the last bin
+## @param nBins
+#  number of bins
+def linBinEdges(altMin, altMax, nBins):
+    return numpy.linspace(altMin, altMax, nBins+1)
+
+####################################
+## @brief Index ranges of the samples of each altitude bin
+#
+#  A bin holds the samples in (edges[k], edges[k+1]], plus the first sample
+#  above edges[k+1], as in the original binning loop: that sample both
+#  closes a bin and opens the next one. LidarRunDict.py was built this way.
+#
+## @param altitude
+#  altitude array sorted in increasing order, shape (N)
+## @param edges
+#  increasing bin edges, shape (nBins+1)
+## @return
+#  a tuple (first sample, last sample excluded) of arrays of shape (nBins)
+def binBounds(altitude, edges):
+    bounds=numpy.searchsorted(altitude, edges, side='right')
+    stops=numpy.minimum(bounds[1:]+1, len(altitude))
+    return (bounds[:-1], stops)
+
+####################################
+## @brief Prefix sums of a stack of profiles
+#
+#  prefix[..., i] is the sum of values[..., :i], so that the sum over any
+#  index range [i, j) is prefix[..., j]-prefix[..., i].
+#
+## @param values
+#  profiles, shape (..., N)
+## @return
+#  prefix sums, shape (..., N+1)
+def prefixSums(values):
+    values=numpy.asarray(values, dtype='d')
+    prefix=numpy.zeros(values.shape[:-1]+(values.shape[-1]+1,), dtype='d')
+    numpy.cumsum(values, axis=-1, out=prefix[...,1:])
+    return prefix
+
+####################################
+## @brief Log of a stack of power profiles
+#
+#  Samples without a positive power, e.g. when the background is exactly
+#  the signal, have no log. With the mask policy their log is NaN and they
+#  are not counted in the LnPower averages. With the drop policy they are
+#  not counted in the power averages either. With the floor policy the
+#  power is set to a floor value, by default the smallest positive power
+#  of the profile.
+#
+## @param power
+#  power profiles, shape (..., N)
+## @param policy
+#  one of LNPOWER_POLICIES
+## @param floor
+#  floor value of the power for the floor policy, None for the default
+## @return
+#  a tuple (log of the power, valid samples mask or None if all are valid)
+def logPower(power, policy=DEFAULT_LNPOWER_POLICY, floor=None):
+    if policy not in LNPOWER_POLICIES:
+        raise ValueError('Unknown policy %s, use one of %s'%(policy, LNPOWER_POLICIES))
+    power=numpy.asarray(power, dtype='d')
+    valid=power>0
+    if valid.all():
+        return (numpy.log(power), None)
+    if policy=='floor':
+        if floor is None:
+            floor=numpy.min(numpy.where(valid, power, numpy.inf), axis=-1)[...,numpy.newaxis]
+            # no positive power at all
+            floor[numpy.isinf(floor)]=numpy.nan
+        return (numpy.log(numpy.maximum(power, floor)), None)
+    lnPower=numpy.empty(power.shape, dtype='d')
+    lnPower.fill(numpy.nan)
+    numpy.log(power, out=lnPower, where=valid)
+    return (lnPower, valid)
+
+####################################
+## @brief Prefix sums of the power and log power of both wavelengths
+#
+#  Invalid samples, as given by logPower, are summed as zeros and are not
+#  counted.
+#
+## @param power
+#  a tuple (power WL1, power WL2), shape (..., N)
+## @param lnPower
+#  a tuple (log power WL1, log power WL2), shape (..., N)
+## @param valid
+#  a tuple (valid samples WL1, valid samples WL2), None if all are valid
+## @param policy
+#  one of LNPOWER_POLICIES, as given to logPower
+## @return
+#  a tuple (prefix sums, prefix sums of the counts or None if all samples
+#  are valid), shape (4, ..., N+1)
+def powerPrefixSums(power, lnPower, valid=(None, None), policy=DEFAULT_LNPOWER_POLICY):
+    if valid[0] is None and valid[1] is None:
+        return (prefixSums(tuple(power)+tuple(lnPower)), None)
+    valid=[numpy.ones(p.shape, dtype=bool) if v is None else v for (p, v) in zip(power, valid)]
+    lnPower=[numpy.where(v, l, 0.) for (l, v) in zip(lnPower, valid)]
+    if policy=='drop':
+        power=[numpy.where(v, p, 0.) for (p, v) in zip(power, valid)]
+        counts=valid+valid
+    else:
+        counts=[numpy.ones(p.shape, dtype=bool) for p in power]+valid
+    return (prefixSums(tuple(power)+tuple(lnPower)), prefixSums(counts))
+
+####################################
+## @brief Average a stack of profiles in altitude bins from their prefix sums
+#
+#  The bins are given by binBounds, each new binning only costs a binary
+#  search of the edges in the sorted altitude array. Bins without any
+#  sample get a count of 0 and a NaN average.
+#
+## @param altitude
+#  altitude array sorted in increasing order, shape (N)
+## @param prefix
+#  prefix sums of the profiles as given by prefixSums, shape (..., N+1)
+## @param edges
+#  increasing bin edges, shape (nBins+1)
+## @param countPrefix
+#  prefix sums of the number of valid points of each profile, with the
+#  shape of prefix, None if all points are valid
+## @return
+#  a tuple (averages with shape (..., nBins), counts with shape (nBins),
+#  or (..., nBins) if countPrefix is given)
+def binPrefixSums(altitude, prefix, edges, countPrefix=None):
+    (starts, stops)=binBounds(altitude, edges)
+    if countPrefix is None:
+        counts=(stops-starts).astype('d')
+    else:
+        counts=countPrefix[...,stops]-countPrefix[...,starts]
+    sums=prefix[...,stops]-prefix[...,starts]
+    averages=numpy.empty(sums.shape, dtype='d')
+    averages.fill(numpy.nan)
+    numpy.divide(sums, counts, out=averages, where=counts>0)
+    return (averages, counts)
+
+####################################
+## @brief Fill the empty bins of a stack of binned profiles
+#
+#  Empty bins have a NaN average, they are interpolated linearly from the
+#  neighbour bins, and get the value of the nearest bin at the ends.
+#  Profiles without any valid bin are left as they are.
+#
+## @param values
+#  binned profiles, shape (..., nBins)
+## @param altitude
+#  bins center altitudes, shape (nBins) or broadcastable to values
+## @return
+#  values without NaN, copied only if some bins are filled
+def fillEmptyBins(values, altitude):
+    values=numpy.asarray(values, dtype='d')
+    empty=numpy.isnan(values)
+    if not empty.any():
+        return values
+    values=values.copy()
+    nBins=values.shape[-1]
+    flat=values.reshape((-1, nBins))
+    altitude=numpy.broadcast_to(numpy.asarray(altitude, dtype='d'), values.shape)
+    altitude=altitude.reshape((-1, nBins))
+    empty=empty.reshape((-1, nBins))
+    for i in numpy.flatnonzero(empty.any(axis=-1)&~empty.all(axis=-1)):
+        valid=~empty[i]
+        flat[i,empty[i]]=numpy.interp(altitude[i,empty[i]], altitude[i,valid], flat[i,valid])
+    return values
+
+####################################
+## @brief Klett inversion computed for all bins at once
+#
+#  The backward recursion
+#  alpha_i = P_i/( P_{i+1}/alpha_{i+1} - 2*int_{r_i}^{r_{i+1}}{P(h).dh} )
+#  is equivalent to
+#  P_i/alpha_i = P_{n-1}/alpha0 - 2*sum_{j>=i}{int_{r_j}^{r_{j+1}}{P(h).dh}}
+#  which is a reverse cumulative sum of the trapezoid integrals.
+#  For beta=l*alpha^k, P is replaced by P^(1/k) and 2 by 2/k.
+#  Empty bins are filled with fillEmptyBins first, else their NaN would
+#  spread to all the bins below them through the cumulative sum.
+#
+## @param power
+#  binned power, shape (..., nBins), the last bin is the reference bin r0
+## @param altitude
+#  bins center altitudes, shape (nBins) or broadcastable to power
+## @param alpha0
+#  alpha at the reference bin, a scalar or an array of shape (...)
+## @param k
+#  as in beta=l*alpha^k, a scalar or an array of shape (...)
+## @return
+#  alpha array with the shape of power, broadcast with alpha0 and k
+def klettInversion(power, altitude, alpha0, k=1):
+    power=fillEmptyBins(power, altitude)
+    altitude=numpy.asarray(altitude, dtype='d')
+    k=numpy.asarray(k, dtype='d')[...,numpy.newaxis]
+    factor=2.
+    if numpy.any(k!=1):
+        power=power**(1./k)
+        factor=2./k
+    reference=power[...,-1:]/numpy.asarray(alpha0, dtype='d')[...,numpy.newaxis]
+    # trapezoid integral between consecutive bins
+    integral=(power[...,1:]+power[...,:-1])/2.*numpy.diff(altitude, axis=-1)
+    # sum from the reference bin downward
+    cumIntegral=numpy.cumsum(integral[...,::-1], axis=-1)[...,::-1]
+    denominator=numpy.empty(numpy.broadcast(power, reference, k).shape, dtype='d')
+    denominator[...,-1:]=reference
+    denominator[...,:-1]=reference-factor*cumIntegral
+    alpha=power/denominator
+    alpha[...,-1]=alpha0
+    return alpha
+
+####################################
+## @brief Number of bins used by the Klett inversion
+#
+#  The reference bin is the last bin with a center below r0, and the
+#  inversion is done on the bins below it.
+#
+## @param centers
+#  bins center altitudes
+## @param r0
+#  reference altitude
+def klettNBins(centers, r0):
+    return int(len(centers)-numpy.count_nonzero(centers>r0)-1)
+
+####################################
+## @brief Integrate alpha over the first bins to get the optical depth
+#
+## @param alpha
+#  binned alpha, shape (..., alphaNBins)
+## @param binsWidth
+#  bins width, shape (nBins)
+## @param centers
+#  bins center altitudes, shape (nBins)
+## @param h
+#  maximum altitude for the integration
+## @return
+#  optical depth, shape (...)
+def integrateAlpha(alpha, binsWidth, centers, h):
+    alpha=numpy.asarray(alpha, dtype='d')
+    nBinToSum=int(alpha.shape[-1]-numpy.count_nonzero(centers>h))
+    nBinToSum=max(nBinToSum, 0)
+    return numpy.sum(alpha[...,:nBinToSum]*binsWidth[:nBinToSum], axis=-1)
+
+####################################
+## @brief Cumulative optical depth from the first bin upward
+#
+#  cumTau[..., i] is the optical depth of the first i bins, i.e. at the
+#  upper edge of bin i-1, and cumTau[..., 0] is 0.
+#
+## @param alpha
+#  binned alpha, shape (..., alphaNBins)
+## @param binsWidth
+#  bins width, shape (nBins)
+## @return
+#  cumulative optical depth, shape (..., alphaNBins+1)
+def cumulativeTau(alpha, binsWidth):
+    alpha=numpy.asarray(alpha, dtype='d')
+    return prefixSums(alpha*binsWidth[:alpha.shape[-1]])
+
+####################################
+## @brief Optical depth up to any altitudes from the cumulative optical depth
+#
+#  By default the bins are summed as in integrateAlpha, so that
+#  opticalDepth(cumTau, centers, h) is integrateAlpha(alpha, binsWidth, centers, h).
+#  If the bin edges are given, the optical depth is interpolated linearly
+#  in altitude between the edges instead.
+#
+## @param cumTau
+#  cumulative optical depth as given by cumulativeTau, shape (..., alphaNBins+1)
+## @param centers
+#  bins center altitudes, shape (nBins)
+## @param h
+#  maximum altitudes for the integration, scalar or any shape
+## @param edges
+#  bins edges, shape (nBins+1), None to sum whole bins
+## @return
+#  optical depth, shape (...)+shape(h)
+def opticalDepth(cumTau, centers, h, edges=None):
+    cumTau=numpy.asarray(cumTau, dtype='d')
+    h=numpy.asarray(h, dtype='d')
+    alphaNBins=cumTau.shape[-1]-1
+    if edges is None:
+        nAbove=len(centers)-numpy.searchsorted(centers, h, side='right')
+        return cumTau[...,numpy.clip(alphaNBins-nAbove, 0, alphaNBins)]
+    edges=numpy.asarray(edges, dtype='d')[:alphaNBins+1]
+    lower=numpy.clip(numpy.searchsorted(edges, h, side='right')-1, 0, alphaNBins-1)
+    fraction=numpy.clip((h-edges[lower])/(edges[lower+1]-edges[lower]), 0., 1.)
+    return cumTau[...,lower]+fraction*(cumTau[...,lower+1]-cumTau[...,lower])
+
+####################################
+## @brief Run quality from Tau4
+#
+#  Runs with a NaN Tau4, or with an empty bin in their binned log power,
+#  are not good.
+#
+## @param tau4WL1
+#  Tau4 for WL1, scalar or array
+## @param tau4WL2
+#  Tau4 for WL2, scalar or array
+## @param binnedLnPower
+#  a tuple (binned LnPW1, binned LnPW2) of shape (..., nBins), None to only
+#  look at Tau4
+## @return
+#  True for good runs, same shape as tau4WL1
+def isGoodRun(tau4WL1, tau4WL2, binnedLnPower=None):
+    # written so that NaN compares as not good
+    with numpy.errstate(invalid='ignore'):
+        good=(numpy.asarray(tau4WL1)>=TAU4_MIN[0])&(numpy.asarray(tau4WL2)>=TAU4_MIN[1])
+    if binnedLnPower is not None:
+        for lnPower in binnedLnPower:
+            good&=~numpy.isnan(lnPower).any(axis=-1)
+    return good
+
+####################################
+## @brief All combinations of the Klett parameters
+#
+## @param r0
+#  reference altitudes
+## @param alpha0
+#  alpha values at the reference altitude
+## @param k
+#  values of k as in beta=l*alpha^k
+## @return
+#  a tuple (r0, alpha0, k) of arrays of shape (nGrid)
+def klettGrid(r0, alpha0, k=(1,)):
+    grid=numpy.meshgrid(numpy.atleast_1d(r0), numpy.atleast_1d(alpha0),\
+                        numpy.atleast_1d(k), indexing='ij')
+    return tuple(numpy.asarray(values, dtype='d').ravel() for values in grid)
+
+####################################
+## @brief Klett inversion and optical depth for many parameter sets
+#
+#  Grid points with the same number of inverted bins, i.e. the same
+#  reference bin, are inverted together by chunks of at most maxElements
+#  alpha values, so that the memory used does not depend on the grid size
+#  beyond the output arrays.
+#
+## @param power
+#  binned power, shape (nRuns, nBins)
+## @param centers
+#  bins center altitudes, shape (nBins)
+## @param binsWidth
+#  bins width, shape (nBins)
+## @param r0
+#  reference altitudes, shape (nGrid)
+## @param alpha0
+#  alpha at the reference altitude, shape (nGrid)
+## @param k
+#  as in beta=l*alpha^k, shape (nGrid)
+## @param h
+#  maximum altitude for the optical depth
+## @param out
+#  array for alpha of shape (nGrid, nRuns, nBins), e.g. a numpy.memmap,
+#  None to allocate it
+## @param maxElements
+#  maximum number of alpha values computed at once
+## @return
+#  a tuple (alpha with shape (nGrid, nRuns, nBins) padded with NaN above the
+#  reference bin, optical depth with shape (nGrid, nRuns))
+def klettSweep(power, centers, binsWidth, r0, alpha0, k=1, h=4, out=None,\
+               maxElements=SWEEP_MAX_ELEMENTS):
+    power=numpy.atleast_2d(numpy.asarray(power, dtype='d'))
+    (nRuns, nBins)=power.shape
+    (r0, alpha0, k)=numpy.broadcast_arrays(numpy.atleast_1d(numpy.asarray(r0, dtype='d')),\
+                                           numpy.asarray(alpha0, dtype='d'),\
+                                           numpy.asarray(k, dtype='d'))
+    nGrid=r0.size
+    if out is None:
+        out=numpy.empty((nGrid, nRuns, nBins), dtype='d')
+    tau=numpy.empty((nGrid, nRuns), dtype='d')
+    # klettNBins for all grid points
+    points=numpy.searchsorted(centers, r0, side='right')-1
+    chunkSize=max(1, maxElements//max(1, nRuns*nBins))
+    for nInverted in numpy.unique(points):
+        indices=numpy.flatnonzero(points==nInverted)
+        if nInverted<2:
+            # no bin below the reference bin
+            out[indices]=numpy.nan
+            tau[indices]=numpy.nan
+            continue
+        for start in range(0, indices.size, chunkSize):
+            chunk=indices[start:start+chunkSize]
+            alpha=klettInversion(power[:,:nInverted], centers[:nInverted],\
+                                 alpha0[chunk,numpy.newaxis], k[chunk,numpy.newaxis])
+            tau[chunk]=integrateAlpha(alpha, binsWidth, centers, h)
+            padded=numpy.empty((chunk.size, nRuns, nBins), dtype='d')
+            padded[...,:nInverted]=alpha
+            padded[...,nInverted:]=numpy.nan
+            out[chunk]=padded
+    return (out, tau)
@@ -14,11 +14,26 @@
 *     class to plot results from the Lidar analysis done with a pLidarRun object
  *  - pRayleigh.py and pRayleighPlotter.py estimate the Rayleigh scattering
  *    contribution
+ *  - pAtmosphere.py : atmospheric models from the atmprof files
  *  - @ref pTriggerRate : pTriggerRate.py estimates a simple trigger rate from
 *     HESS camera ROOT files
+ *  - pTriggerSurvey.py : trigger rates of many runs with a pool of workers
  *  - pSashInterface.py : interface to HESS ROOT Sash data format (Sash::DataSet)
+ *  - pRunHeaderCache.py : persistent cache of the run headers, read without ROOT
+ *  - rootArrays.py : ROOT arrays and Lidar tree entries to numpy arrays
+ *  - triggerAlgorithms.py : trigger rate from time stamps with numpy
  *  - pDataInterface.py : interface to data on disk by run number, file path or
  *    directory
+ *  - pLidarCache.py : memory mapped binary cache of the parsed Lidar raw data
+ *  - lidarAlgorithms.py : vectorized analysis stages working on stacks of runs
+ *  - pLidarBatch.py : pLidarBatch class to analyse many runs sharing the same
+ *    range grid as 2-D arrays
+ *  - pRunDictBuilder.py : parallel and resumable build of LIDAR_RUN_DICT
+ *  - pLidarTimeSeries.py : transmission of every Lidar profile of a run
+ *  - pRunSummaryStore.py : columnar store of the runs summary
+ *  - pDataInventory.py : threaded and cached inventory of the runs directories
+ *  - pLidarWatcher.py : watch a data directory and ingest new Lidar runs in
+ *    the run summary store
  *  - @ref tools : toolBox.py
  *
  * @section pLidarRun Lidar Data analysis
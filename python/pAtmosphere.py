@@ -0,0 +1,159 @@
+#!/bin/env python
+
+## @file
+#  Atmospheric models from the atmprof files.
+#  The profiles are parsed once per process, the density is interpolated
+#  in log scale, and the interpolation tables are kept for each altitude
+#  grid, so that the molecular extinction of many runs is only an array
+#  product.
+#
+
+import os
+import numpy
+
+from __logging__ import *
+from pRayleigh   import pRayleigh, rayleighPar0
+
+## Directory of the atmprof files
+ATMPROF_DIR=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+## Atmospheric model files by name
+ATM_MODELS={'us-std':'atmprof6_us-std.dat', 'windhoek':'atmprof10_windoek.dat'}
+
+## Parsed profiles by file name
+ATM_PROFILES={}
+
+####################################
+## @brief Parse an atmprof file
+#
+#  The first four columns (altitude, density, thickness, n-1) are always
+#  there, the next ones (temperature, pressure, water vapour) are kept if
+#  all lines have them. Text after the numbers, e.g. (extrapolated), is
+#  ignored. The result is kept, so that each file is only parsed once.
+#
+## @param filename
+#  an atmprof file name
+## @return
+#  a numpy array with one row per column of the file
+def loadAtmProfile(filename):
+    filename=os.path.abspath(filename)
+    if filename in ATM_PROFILES:
+        return ATM_PROFILES[filename]
+    rows=[]
+    for line in open(filename, 'r'):
+        if line.strip()=='' or line.lstrip().startswith('#'):
+            continue
+        values=[]
+        for field in line.split():
+            try:
+                values.append(float(field))
+            except ValueError:
+                break
+        if len(values)<4:
+            logger.warning('Skipping line in %s: %s'%(filename, line.strip()))
+            continue
+        rows.append(values)
+    nColumns=min(len(values) for values in rows)
+    profile=numpy.array([values[:nColumns] for values in rows], dtype='d').T
+    profile.setflags(write=False)
+    ATM_PROFILES[filename]=profile
+    logger.info('Atmospheric profile %s: %d altitudes'%(filename, profile.shape[1]))
+    return profile
+
+####################################
+## @brief Class to handle an atmospheric model
+#
+class pAtmosphere(object):
+    ####################################
+    ## @brief Constructor
+    #
+    ## @param self
+    #  the object instance
+    ## @param model
+    #  a model name of ATM_MODELS or an atmprof file name
+    def __init__(self, model='windhoek'):
+        if model in ATM_MODELS:
+            model=os.path.join(ATMPROF_DIR, ATM_MODELS[model])
+        self.FileName=model
+        profile=loadAtmProfile(model)
+        ## Altitude above sea level in km
+        self.Altitude=profile[0]
+        ## Density in g/cm^3
+        self.Rho=profile[1]
+        ## Vertical thickness in g/cm^2
+        self.Thick=profile[2]
+        ## Refractive index minus 1
+        self.NMinus1=profile[3]
+        ## Temperature in K, pressure in mbar, water vapour fraction if given
+        self.Temperature=profile[4] if profile.shape[0]>4 else None
+        self.Pressure=profile[5] if profile.shape[0]>5 else None
+        self.WaterVapour=profile[6] if profile.shape[0]>6 else None
+        self.LnRho=numpy.log(self.Rho)
+        ## Density ratio tables by altitude grid
+        self.Tables={}
+
+    ####################################
+    ## @brief Density at any altitude, interpolated in log scale
+    #
+    ## @param self
+    #  the object instance
+    ## @param h
+    #  altitudes above sea level in km
+    def getDensity(self, h):
+        return numpy.exp(numpy.interp(h, self.Altitude, self.LnRho))
+
+    ####################################
+    ## @brief Density relative to sea level along a line of sight
+    #
+    #  Tables are computed once for each grid and kept.
+    #
+    ## @param self
+    #  the object instance
+    ## @param grid
+    #  distances from the site in km, e.g. the Lidar bins centers
+    ## @param costheta
+    #  the cosine of the theta angle
+    ## @param siteAltitude
+    #  altitude of the site above sea level in km
+    ## @return
+    #  rho(siteAltitude+costheta*grid)/rho(0), read only
+    def getDensityRatio(self, grid, costheta=1., siteAltitude=pRayleigh.HTHEMIS):
+        grid=numpy.asarray(grid, dtype='d')
+        key=(grid.tobytes(), float(costheta), float(siteAltitude))
+        table=self.Tables.get(key)
+        if table is None:
+            table=self.getDensity(siteAltitude+costheta*grid)/self.getDensity(0.)
+            table.setflags(write=False)
+            self.Tables[key]=table
+        return table
+
+    ####################################
+    ## @brief Molecular extinction from the density profile
+    #
+    #  The Rayleigh extinction at sea level scaled by the relative density,
+    #  which gives back pRayleigh.getRayleigh for an exponential atmosphere.
+    #
+    ## @param self
+    #  the object instance
+    ## @param grid
+    #  distances from the site in km, shape (nH)
+    ## @param Lambda
+    #  wave lengths in nm, scalar or shape (nWl)
+    ## @param costheta
+    #  the cosine of the theta angle
+    ## @param siteAltitude
+    #  altitude of the site above sea level in km
+    ## @return
+    #  extinction in 1/km, shape (nH) or (nWl, nH)
+    def getExtinction(self, grid, Lambda, costheta=1., siteAltitude=pRayleigh.HTHEMIS):
+        ratio=self.getDensityRatio(grid, costheta, siteAltitude)
+        # rayleighPar0 is the sea level extinction
+        return numpy.multiply.outer(rayleighPar0(Lambda), ratio)
+
+
+if __name__ == '__main__':
+    for name in sorted(ATM_MODELS.keys()):
+        atm=pAtmosphere(name)
+        grid=numpy.linspace(0.8, 10., 10)
+        print(name)
+        print(atm.getExtinction(grid, [532., 355.]))
@@ -3,9 +3,9 @@
 #  or a run number, locally.
 
 import os
-import glob
 
 from __logging__ import *
+from pDataInventory import pDataInventory, LIDAR_INVENTORY_CACHE
 
 ## Default data directory on mmy laptop
 HESS_DATA_DIR='/data/Hess/data/'
@@ -20,11 +20,26 @@ class pDataInterface(object):
     #
     ## @param self
     #  the object instance
+    ## @param runsList
+    #  a list of required run numbers
     ## @param directory
     #  a directory with data files
-    def __init__(self, runsList=[], directory=HESS_DATA_DIR):
-        self.RunsList=runsList
+    ## @param inventoryCache
+    #  the inventory cache file, None for no cache
+    ## @param nThreads
+    #  number of threads scanning the runs directories
+    ## @param fullScan
+    #  take the inventory of all runs directories, else only the directories
+    #  of the required runs are scanned. None to take the full inventory only
+    #  if there is an inventory cache
+    def __init__(self, runsList=None, directory=HESS_DATA_DIR,\
+                 inventoryCache=LIDAR_INVENTORY_CACHE, nThreads=8, fullScan=None):
+        self.RunsList=list(runsList or [])
         self.Directory=directory
+        if fullScan is None:
+            fullScan=inventoryCache is not None
+        self.FullScan=fullScan
+        self.Inventory=pDataInventory(directory, inventoryCache, nThreads)
         self.AllRunsDir=[]
         self.AllRunsDict={}
         self.FailedRunsList=[]
@@ -38,22 +53,42 @@ class pDataInterface(object):
     #
     ## @param self
     #  the object instance
-    def __hashDataDir__(self):
+    ## @param runsList
+    #  runs whose directories are scanned if not FullScan, None for RunsList
+    def __hashDataDir__(self, runsList=None):
         logger.info('Hashing input directory for HESS runs:\n%s'%self.Directory)
-        self.AllRunsDir=glob.glob(HESS_DATA_DIR+'/run*')
-        for adir in self.AllRunsDir:
-            run=int(adir.split('/run0')[1])
-            self.AllRunsDict[run]={}
-            self.AllRunsDict[run]['DataDir']=adir
+        if self.FullScan:
+            runs=self.Inventory.update()
+        else:
+            runs=self.Inventory.update(self.RunsList if runsList is None else runsList)
+        self.AllRunsDir=[runs[run]['DataDir'] for run in sorted(runs.keys())]
+        for run in runs:
+            if run not in self.AllRunsDict:
+                self.AllRunsDict[run]={'DataDir':runs[run]['DataDir']}
         self.__checkRuns__()
         
+    ####################################
+    ## @brief Add runs to the list of required runs
+    #
+    ## @param self
+    #  the object instance
+    ## @param runsList
+    #  a list of run numbers
+    def addRuns(self, runsList):
+        self.RunsList.extend(runsList)
+        if self.FullScan:
+            self.__checkRuns__()
+        else:
+            self.__hashDataDir__(runsList)
+
     ####################################
     ## @brief Check that required runs are available
     #
     ## @param self
     #  the object instance
     def __checkRuns__(self):
-        for run in self.RunsList:
+        # iterate over a copy, failed runs are removed from the list
+        for run in list(self.RunsList):
             runRC=self.__hashRunDir__(run)
             if runRC==1:
                 logger.warning('Run %s is not available. Removed from dictionnary.'%run)
@@ -77,18 +112,15 @@ class pDataInterface(object):
         if run not in self.AllRunsDict.keys():
            return 1
         logger.debug('Hashing input directory for HESS runs directory:\n%s'%self.AllRunsDict[run]['DataDir'])
-        self.AllRunsDict[run]['LidarFiles']=glob.glob(os.path.join(self.AllRunsDict[run]['DataDir'],'run_%06d_Lidar_*.root'%run))
-        self.AllRunsDict[run]['CameraFiles']=glob.glob(os.path.join(self.AllRunsDict[run]['DataDir'],'run_%06d_Camera_*.root'%run))        
-        self.AllRunsDict[run]['TxtFiles']=glob.glob(os.path.join(self.AllRunsDict[run]['DataDir'],'*.txt'))
-        self.AllRunsDict[run]['FitsFiles']=glob.glob(os.path.join(self.AllRunsDict[run]['DataDir'],'*.fits'))
-        for key in self.AllRunsDict[run].keys():
-            if key not in ['DataDir']:
-                self.AllRunsDict[run][key].sort()
-            if len(self.AllRunsDict[run]['LidarFiles'])>0 and\
-               len(self.AllRunsDict[run]['CameraFiles'])>0:
-                return 0
-            else:           
-                return 2
+        # the files were classified when taking the inventory
+        runFiles=self.Inventory.Runs[run]
+        for key in ['LidarFiles', 'CameraFiles', 'TxtFiles', 'FitsFiles']:
+            self.AllRunsDict[run][key]=list(runFiles[key])
+        if len(self.AllRunsDict[run]['LidarFiles'])>0 and\
+           len(self.AllRunsDict[run]['CameraFiles'])>0:
+            return 0
+        else:
+            return 2
 
 
 if __name__ == '__main__':
@@ -0,0 +1,225 @@
+## @file
+#  An inventory of the HESS runs directories.
+#  Each run directory is listed once and its files classified as Lidar,
+#  Camera, txt or fits files. Directories are scanned by a pool of threads,
+#  and the result is kept in a cache file, so that only the directories
+#  whose modification time changed are listed again.
+#
+
+import os
+import re
+import json
+import fnmatch
+from multiprocessing.pool import ThreadPool
+
+from __logging__ import *
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir=None
+
+## Inventory cache file, None to keep the inventory in memory only
+LIDAR_INVENTORY_CACHE=os.environ.get('LIDAR_INVENTORY_CACHE', None)
+
+## Regular expression for the runs directory names
+RUN_DIR_RE=re.compile(r'^run0*(\d+)$')
+
+## File categories, in the order they are checked
+FILE_CATEGORIES=[('LidarFiles', 'run_%06d_Lidar_*.root'),
+                 ('CameraFiles', 'run_%06d_Camera_*.root'),
+                 ('TxtFiles', '*.txt'),
+                 ('FitsFiles', '*.fits')]
+
+####################################
+## @brief List a directory
+#
+#  Use scandir when available, so that the file type usually comes
+#  with the listing and no stat is needed.
+#
+## @param directory
+#  the directory to list
+## @return
+#  a list of tuples (name, isDir)
+def listDir(directory):
+    if scandir is not None:
+        return [(entry.name, entry.is_dir()) for entry in scandir(directory)]
+    return [(name, os.path.isdir(os.path.join(directory, name)))\
+            for name in os.listdir(directory)]
+
+####################################
+## @brief Classify the files of a run directory
+#
+## @param dataDir
+#  the run directory
+## @param run
+#  the run number
+## @return
+#  a dictionnary with the sorted file lists of each category
+def classifyRunDir(dataDir, run):
+    runFiles=dict((key, []) for (key, pattern) in FILE_CATEGORIES)
+    patterns=[(key, pattern%run if '%' in pattern else pattern)\
+              for (key, pattern) in FILE_CATEGORIES]
+    for (name, isDir) in listDir(dataDir):
+        # hidden files are skipped, as glob does
+        if isDir or name.startswith('.'):
+            continue
+        for (key, pattern) in patterns:
+            if fnmatch.fnmatchcase(name, pattern):
+                runFiles[key].append(os.path.join(dataDir, name))
+    for key in runFiles:
+        runFiles[key].sort()
+    return runFiles
+
+####################################
+## @brief Class to manage the inventory of a data directory
+#
+class pDataInventory(object):
+
+    ####################################
+    ## @brief Constructor
+    #
+    ## @param self
+    #  the object instance
+    ## @param directory
+    #  a directory with one run* directory per run
+    ## @param cacheFile
+    #  the inventory cache file, None for no cache
+    ## @param nThreads
+    #  number of threads scanning the runs directories
+    def __init__(self, directory, cacheFile=LIDAR_INVENTORY_CACHE, nThreads=8):
+        self.Directory=directory
+        self.CacheFile=cacheFile
+        self.NThreads=nThreads
+        ## Inventory by run number
+        self.Runs={}
+        ## Number of directories listed again during the last update
+        self.NScanned=0
+
+    ####################################
+    ## @brief Read the inventory cache
+    #
+    ## @param self
+    #  the object instance
+    ## @return
+    #  the cached inventory by run number, empty if not usable
+    def readCache(self):
+        if self.CacheFile is None or not os.path.exists(self.CacheFile):
+            return {}
+        try:
+            cached=json.load(open(self.CacheFile, 'r'))
+        except (IOError, ValueError) as e:
+            logger.warning('Could not read inventory cache %s: %s'%(self.CacheFile, e))
+            return {}
+        if cached.get('Directory')!=os.path.abspath(self.Directory):
+            return {}
+        runs={}
+        for (run, val) in cached['Runs'].items():
+            # json gives unicode strings with python 2
+            runFiles=dict((key, [str(path) for path in val[key]])\
+                          for (key, pattern) in FILE_CATEGORIES)
+            runFiles['DataDir']=str(val['DataDir'])
+            runFiles['MTime']=val['MTime']
+            runs[int(run)]=runFiles
+        return runs
+
+    ####################################
+    ## @brief Write the inventory cache
+    #
+    ## @param self
+    #  the object instance
+    ## @param runs
+    #  the inventory by run number to write
+    def writeCache(self, runs):
+        if self.CacheFile is None:
+            return
+        cached={'Directory':os.path.abspath(self.Directory),\
+                'Runs':dict((str(run), val) for (run, val) in runs.items())}
+        tmpFile=self.CacheFile+'.tmp'
+        try:
+            json.dump(cached, open(tmpFile, 'w'))
+            os.rename(tmpFile, self.CacheFile)
+        except (IOError, OSError) as e:
+            logger.warning('Could not write inventory cache %s: %s'%(self.CacheFile, e))
+
+    ####################################
+    ## @brief Scan a run directory unless it did not change
+    #
+    ## @param self
+    #  the object instance
+    ## @param args
+    #  a tuple (run, run directory, cached inventory of the run or None)
+    ## @return
+    #  a tuple (run, inventory of the run, True if it was listed again)
+    def scanRunDir(self, args):
+        (run, dataDir, cached)=args
+        mtime=os.stat(dataDir).st_mtime
+        if cached is not None and cached['MTime']==mtime and cached['DataDir']==dataDir:
+            return (run, cached, False)
+        runFiles=classifyRunDir(dataDir, run)
+        runFiles['DataDir']=dataDir
+        runFiles['MTime']=mtime
+        return (run, runFiles, True)
+
+    ####################################
+    ## @brief Update the inventory
+    #
+    #  The top directory is listed once. All run directories are scanned,
+    #  or only those of the given runs, in which case the inventory of the
+    #  other runs is kept as it is.
+    #
+    ## @param self
+    #  the object instance
+    ## @param runs
+    #  a list of run numbers, None for all runs of the directory
+    ## @return
+    #  the inventory by run number
+    def update(self, runs=None):
+        cached=self.readCache()
+        wanted=None if runs is None else set(int(run) for run in runs)
+        todo=[]
+        for (name, isDir) in listDir(self.Directory):
+            match=RUN_DIR_RE.match(name)
+            if match is None or not isDir:
+                continue
+            run=int(match.group(1))
+            if wanted is not None and run not in wanted:
+                continue
+            previous=cached.get(run, self.Runs.get(run))
+            todo.append((run, os.path.join(self.Directory, name), previous))
+        if self.NThreads>1 and len(todo)>1:
+            pool=ThreadPool(min(self.NThreads, len(todo)))
+            try:
+                results=pool.map(self.scanRunDir, todo)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results=[self.scanRunDir(args) for args in todo]
+        if wanted is None:
+            self.Runs={}
+        self.NScanned=0
+        for (run, runFiles, scanned) in results:
+            self.Runs[run]=runFiles
+            self.NScanned+=scanned
+        logger.info('Inventory of %s: %d runs, %d directories scanned'%\
+                    (self.Directory, len(results), self.NScanned))
+        if wanted is None:
+            if self.NScanned>0 or len(cached)!=len(self.Runs):
+                self.writeCache(self.Runs)
+        elif self.NScanned>0 and self.CacheFile is not None:
+            # keep the other runs of the cache
+            cached.update((run, runFiles) for (run, runFiles, scanned) in results)
+            self.writeCache(cached)
+        return self.Runs
+
+if __name__ == '__main__':
+    import sys
+    import time
+    start=time.time()
+    inventory=pDataInventory(sys.argv[1], cacheFile=sys.argv[2] if len(sys.argv)>2 else None)
+    inventory.update()
+    print('%d runs in %.2f s'%(len(inventory.Runs), time.time()-start))
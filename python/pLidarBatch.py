@@ -0,0 +1,495 @@
+#!/bin/env python
+
+## @file
+#  Batch analysis of many Lidar runs at once.
+#  Runs sharing the same range grid are stacked into 2-D arrays and every
+#  analysis stage works on the whole stack with array operations.
+#
+
+import os
+import math
+import numpy
+import hashlib
+
+from __logging__        import *
+from pLidarRun          import pLidarRun, formatRunDict
+from lidarAlgorithms    import *
+
+## Memory budget of the toy Monte Carlo in bytes
+TOY_MAX_BYTES=2**28
+
+####################################
+## @brief Growing stack of the raw signals of the runs sharing a range grid
+#
+class pRawStack(object):
+    ####################################
+    ## @brief Constructor
+    #
+    ## @param self
+    #  the object instance
+    ## @param altitude
+    #  the range grid
+    ## @param order
+    #  rank of the grid in the order the grids were found
+    def __init__(self, altitude, order):
+        self.Altitude=numpy.array(altitude, dtype='d')
+        self.Order=order
+        self.NRuns=0
+        self.WL1=numpy.empty((0, self.Altitude.size), dtype='d')
+        self.WL2=numpy.empty((0, self.Altitude.size), dtype='d')
+        self.FileNames=[]
+        self.RunNumbers=[]
+        self.DateTimes=[]
+
+    ####################################
+    ## @brief Copy the signals of a run, doubling the stack when it is full
+    #
+    ## @param self
+    #  the object instance
+    ## @param run
+    #  a pLidarRun on the grid of the stack
+    def append(self, run):
+        if self.NRuns==len(self.WL1):
+            size=max(16, 2*self.NRuns)
+            for name in ('WL1', 'WL2'):
+                grown=numpy.empty((size, self.Altitude.size), dtype='d')
+                grown[:self.NRuns]=getattr(self, name)[:self.NRuns]
+                setattr(self, name, grown)
+        self.WL1[self.NRuns]=run.RawWL1
+        self.WL2[self.NRuns]=run.RawWL2
+        self.FileNames.append(run.FileName)
+        self.RunNumbers.append(run.RunNumber)
+        self.DateTimes.append(run.DateTime)
+        self.NRuns+=1
+
+####################################
+## @brief Class to analyse a batch of LIDAR runs with a common altitude grid
+#
+#  Arrays of the single run analysis (pLidarRun) get a leading run axis,
+#  e.g. RawWL1 is (nRuns, NPoints) and BinnedAlphaPW1 is (nRuns, AlphaNBins).
+#
+class pLidarBatch(object):
+    ####################################
+    ## @brief Constructor
+    #
+    ## @param self
+    #  the object instance
+    ## @param fileList
+    #  a list of Lidar data file names, None to give the profiles
+    #  later with setProfiles
+    ## @param process
+    #  run the full analysis
+    ## @param nBins
+    #  number of bins to use for calculations
+    ## @param cache
+    #  a pLidarCache for the raw data, None to use the default one
+    ## @param lnPowerPolicy
+    #  what to do with samples without a positive power, see lnPower
+    def __init__(self, fileList, process=True, nBins=100, cache=None,\
+                 lnPowerPolicy=DEFAULT_LNPOWER_POLICY):
+        self.NBins=nBins
+        self.NRuns=0
+        ## Files that could not be stacked, because of a different range grid
+        self.RejectedFiles=[]
+        ## Files that could not be read
+        self.FailedFiles=[]
+        if fileList is None:
+            return
+        self.readFiles(fileList, cache)
+        if process and self.NRuns>0:
+            self.process(self.NBins, lnPowerPolicy)
+
+    ####################################
+    ## @brief Read all files and stack raw data
+    #
+    #  The runs are stacked on the most common range grid, the runs with
+    #  another grid are rejected and the files that can not be read skipped.
+    #  The signals are copied into one growing stack per grid as soon as a
+    #  file is read, so that only one pLidarRun, and one memory mapped
+    #  cache file, is open at a time.
+    #
+    ## @param self
+    #  the object instance
+    ## @param fileList
+    #  a list of Lidar data file names
+    ## @param cache
+    #  a pLidarCache for the raw data
+    def readFiles(self, fileList, cache=None):
+        logger.info('Reading %d Lidar files'%len(fileList))
+        # stacks by grid key, and the grid key of each file read
+        stacks={}
+        fileGrids=[]
+        for filename in fileList:
+            try:
+                run=pLidarRun(filename, process=False, cache=cache)
+            except (Exception, SystemExit) as e:
+                logger.error('Failed to read %s: %s'%(filename, e))
+                self.FailedFiles.append(filename)
+                continue
+            altitude=numpy.ascontiguousarray(run.RawAltitude, dtype='d')
+            key=hashlib.sha1(altitude.tobytes()).hexdigest()
+            if key not in stacks:
+                stacks[key]=pRawStack(altitude, len(stacks))
+            stacks[key].append(run)
+            fileGrids.append((filename, key))
+            # release the run and its memory mapped cache before the next file
+            del run
+        self.FileNames=[]
+        self.RunNumbers=[]
+        self.DateTimes=[]
+        self.NRuns=0
+        if len(stacks)==0:
+            logger.error('No run to analyse')
+            return
+        # the most common range grid, the first one seen in case of a tie
+        stack=max(stacks.values(), key=lambda stack: (stack.NRuns, -stack.Order))
+        for (filename, key) in fileGrids:
+            if stacks[key] is not stack:
+                logger.warning('%s has a different range grid, not stacked'%filename)
+                self.RejectedFiles.append(filename)
+        self.RawAltitude=stack.Altitude
+        self.NPoints=self.RawAltitude.size
+        self.RawWL1=stack.WL1[:stack.NRuns]
+        self.RawWL2=stack.WL2[:stack.NRuns]
+        self.FileNames=stack.FileNames
+        self.RunNumbers=numpy.array(stack.RunNumbers)
+        self.DateTimes=stack.DateTimes
+        self.NRuns=stack.NRuns
+        if len(self.FailedFiles)>0:
+            logger.warning('Failed files: %s'%self.FailedFiles)
+        logger.info('%d runs stacked with %d points'%(self.NRuns, self.NPoints))
+
+    ####################################
+    ## @brief Use profiles already in memory, e.g. the entries of a ROOT file
+    #
+    ## @param self
+    #  the object instance
+    ## @param altitude
+    #  the common altitude grid, shape (NPoints)
+    ## @param wl1
+    #  raw signals for wavelength 1, shape (nRuns, NPoints)
+    ## @param wl2
+    #  raw signals for wavelength 2, shape (nRuns, NPoints)
+    ## @param runNumbers
+    #  run number of each profile
+    ## @param fileNames
+    #  file name of each profile
+    ## @param dateTimes
+    #  date and time of each profile
+    def setProfiles(self, altitude, wl1, wl2, runNumbers=None, fileNames=None, dateTimes=None):
+        self.RawAltitude=numpy.asarray(altitude, dtype='d')
+        self.RawWL1=numpy.asarray(wl1, dtype='d')
+        self.RawWL2=numpy.asarray(wl2, dtype='d')
+        (self.NRuns, self.NPoints)=self.RawWL1.shape
+        if runNumbers is None:
+            runNumbers=numpy.zeros(self.NRuns, dtype=int)
+        self.RunNumbers=numpy.asarray(runNumbers)
+        self.FileNames=fileNames if fileNames is not None else ['']*self.NRuns
+        self.DateTimes=dateTimes if dateTimes is not None else ['']*self.NRuns
+
+    ####################################
+    ## @brief Full processing including Klett inversion and Tau4
+    #
+    ## @param self
+    #  the object instance
+    ## @param nBins
+    #  number of bins to use for calculations
+    ## @param lnPowerPolicy
+    #  what to do with samples without a positive power, see lnPower
+    def process(self, nBins, lnPowerPolicy=DEFAULT_LNPOWER_POLICY):
+        self.reduce()
+        self.lnPower(lnPowerPolicy)
+        self.binData(nBins)
+        self.run_Klett()
+        self.TauAndQuality()
+
+    ####################################
+    ## @brief Subtract background and calculate power for all runs
+    #
+    ## @param self
+    #  the object instance
+    ## @param altmin
+    #  minimum altitude to consider for signal
+    ## @param altmax
+    #  maximum altitute to consider for signal
+    ## @param bkgmin
+    #  minimum altitude to consider for background estimation
+    ## @param bkgmax
+    #  maximum altitute to consider for background estimation
+    ## @param bkgMethod
+    #  background estimator, one of BKG_METHODS
+    ## @param bkgWindows
+    #  list of (min, max) background windows, None for (bkgmin, bkgmax) only
+    def reduce(self, altmin=0.800, altmax=10., bkgmin=20., bkgmax=25., bkgMethod='mean',\
+               bkgWindows=None):
+        logger.info('Subtract background and produce reduced data and power arrays')
+        self.AltMin=altmin
+        self.AltMax=altmax
+        self.BkgMin=bkgmin
+        self.BkgMax=bkgmax
+        if bkgWindows is None:
+            bkgWindows=[(bkgmin, bkgmax)]
+        self.BkgWindows=bkgWindows
+        self.BkgMethod=bkgMethod
+        (self.BkgMinIndex, self.BkgMaxIndex)=windowIndices(self.RawAltitude, bkgmin, bkgmax)
+        (self.AltMinIndex, self.AltMaxIndex)=windowIndices(self.RawAltitude, altmin, altmax)
+        self.Alt=self.RawAltitude[self.AltMinIndex:self.AltMaxIndex]
+        (self.BkgWL1, bkgWL1)=estimateBackground(self.RawAltitude, self.RawWL1, bkgWindows,\
+                                                 bkgMethod, self.Alt)
+        (self.BkgWL2, bkgWL2)=estimateBackground(self.RawAltitude, self.RawWL2, bkgWindows,\
+                                                 bkgMethod, self.Alt)
+        self.WL1=abs(self.RawWL1[:,self.AltMinIndex:self.AltMaxIndex]-bkgWL1)
+        self.WL2=abs(self.RawWL2[:,self.AltMinIndex:self.AltMaxIndex]-bkgWL2)
+        self.PW1=self.WL1*self.Alt**2
+        self.PW2=self.WL2*self.Alt**2
+        self.NData=self.Alt.size
+
+    ####################################
+    ## @brief Calculate Ln of Power for all runs
+    #
+    ## @param self
+    #  the object instance
+    ## @param policy
+    #  what to do with samples without a positive power, one of
+    #  LNPOWER_POLICIES, see logPower
+    ## @param floor
+    #  floor value of the power for the floor policy, None for the default
+    def lnPower(self, policy=DEFAULT_LNPOWER_POLICY, floor=None):
+        logger.info('Calculate Ln of Power')
+        self.LnPowerPolicy=policy
+        (self.LnPW1, self.ValidPW1)=logPower(self.PW1, policy, floor)
+        (self.LnPW2, self.ValidPW2)=logPower(self.PW2, policy, floor)
+
+    ####################################
+    ## @brief Bin data in log scale for all runs
+    #
+    ## @param self
+    #  the object instance
+    ## @param nBins
+    #  number of bins between AltMin and AltMax
+    def binData(self, nBins=50):
+        logger.info('Bin data')
+        self.NBins=nBins
+        self.BinLnAltWidth=(math.log(self.AltMax)-math.log(self.AltMin))/self.NBins
+        self.BinsAlt=logBinEdges(self.AltMin, self.AltMax, self.NBins)
+        self.BinsAltMin=self.BinsAlt[:-1]
+        self.BinsAltMax=self.BinsAlt[1:]
+        self.BinsAltCenter=(self.BinsAltMin+self.BinsAltMax)/2.
+        (prefix, countPrefix)=powerPrefixSums((self.PW1, self.PW2), (self.LnPW1, self.LnPW2),\
+                                              (self.ValidPW1, self.ValidPW2), self.LnPowerPolicy)
+        (binned, counts)=binPrefixSums(self.Alt, prefix, self.BinsAlt, countPrefix)
+        if countPrefix is None:
+            self.BinnedNpoints=counts
+            self.BinnedValidNpoints=None
+        else:
+            # valid points for PW1, PW2, LnPW1 and LnPW2 of each run
+            self.BinnedValidNpoints=counts
+            (starts, stops)=binBounds(self.Alt, self.BinsAlt)
+            self.BinnedNpoints=(stops-starts).astype('d')
+        (self.BinnedPW1, self.BinnedPW2, self.BinnedLnPW1, self.BinnedLnPW2)=binned
+        logger.info('Binned data ready.')
+
+    ####################################
+    ## @brief Klett inversion of all runs and both wavelengths at once
+    #
+    ## @param self
+    #  the object instance
+    ## @param r0
+    #  reference altitude
+    ## @param alpha0wl1
+    #  alpha0 for wavelength 1
+    ## @param alpha0wl2
+    #  alpha0 for wavelength 2
+    ## @param k
+    #  as in beta=l*alpha^k
+    ## @param l
+    #  as in beta=l*alpha^k
+    def run_Klett(self, r0=10, alpha0wl1=0.0038, alpha0wl2=0.018, k=1, l=1):
+        logger.info('Klett: starting inversion of %d runs'%self.NRuns)
+        self.Klett_r0=r0
+        self.Klett_alpha0wl1=alpha0wl1
+        self.Klett_alpha0wl2=alpha0wl2
+        self.Klett_k=k
+        self.Klett_l=l
+        self.AlphaNBins=klettNBins(self.BinsAltCenter, r0)
+        power=numpy.array((self.BinnedPW1[:,:self.AlphaNBins],\
+                           self.BinnedPW2[:,:self.AlphaNBins]))
+        alpha0=numpy.array((alpha0wl1, alpha0wl2), dtype='d')[:,numpy.newaxis]
+        alpha=klettInversion(power, self.BinsAltCenter[:self.AlphaNBins], alpha0, k)
+        (self.BinnedAlphaPW1, self.BinnedAlphaPW2)=alpha
+        # cumulative optical depth, shape (2, nRuns, AlphaNBins+1)
+        self.CumTau=cumulativeTau(alpha, self.BinsAltMax-self.BinsAltMin)
+        (self.CumTauWL1, self.CumTauWL2)=self.CumTau
+        logger.info('Klett: inversion done.')
+
+    ####################################
+    ## @brief Klett inversion and optical depth of all runs for many
+    #  parameter sets
+    #
+    #  The parameter sets are given point by point, klettGrid gives all
+    #  combinations of lists of values. The run attributes are not changed.
+    #
+    ## @param self
+    #  the object instance
+    ## @param r0
+    #  reference altitudes, shape (nGrid)
+    ## @param alpha0
+    #  alpha at the reference altitude, shape (nGrid)
+    ## @param k
+    #  as in beta=l*alpha^k, shape (nGrid)
+    ## @param wl
+    #  wavelength, 1 or 2
+    ## @param h
+    #  maximum altitude for the optical depth
+    ## @param out
+    #  array for alpha of shape (nGrid, nRuns, NBins), e.g. a numpy.memmap,
+    #  None to allocate it
+    ## @return
+    #  a tuple (alpha with shape (nGrid, nRuns, NBins) padded with NaN,
+    #  optical depth with shape (nGrid, nRuns))
+    def sweepKlett(self, r0, alpha0, k=1, wl=1, h=4, out=None):
+        power=self.BinnedPW1 if wl==1 else self.BinnedPW2
+        logger.info('Klett: sweep of %d parameter sets for %d runs'%\
+                    (numpy.broadcast(r0, alpha0, k).size, self.NRuns))
+        return klettSweep(power, self.BinsAltCenter, self.BinsAltMax-self.BinsAltMin,\
+                          r0, alpha0, k, h, out)
+
+    ####################################
+    ## @brief Integrate Alpha to get absorption for the first h km
+    #  and set the quality of all runs
+    #
+    ## @param self
+    #  the object instance
+    ## @param h
+    #  maximum altitude for intergration
+    def TauAndQuality(self, h=4):
+        (self.Tau4WL1, self.Tau4WL2)=self.calcTau(h)
+        self.IsGood=isGoodRun(self.Tau4WL1, self.Tau4WL2, (self.BinnedLnPW1, self.BinnedLnPW2))
+        return (self.Tau4WL1, self.Tau4WL2)
+
+    ####################################
+    ## @brief Absorption of all runs for the first h km
+    #
+    ## @param self
+    #  the object instance
+    ## @param h
+    #  maximum altitude for intergration, scalar or array
+    ## @param interpolate
+    #  interpolate linearly between the bin edges, else sum whole bins as
+    #  for Tau4
+    ## @return
+    #  a tuple (Tau WL1, Tau WL2), arrays of shape (nRuns)+shape(h)
+    def calcTau(self, h=4, interpolate=False):
+        edges=self.BinsAlt if interpolate else None
+        tau=opticalDepth(self.CumTau, self.BinsAltCenter, h, edges)
+        return (tau[0], tau[1])
+
+    ####################################
+    ## @brief Transmission probability of all runs for the first h km
+    #
+    ## @param self
+    #  the object instance
+    ## @param h
+    #  maximum altitude for intergration, scalar or array
+    ## @param interpolate
+    #  interpolate linearly between the bin edges, else sum whole bins
+    def calcTransmission(self, h=4, interpolate=False):
+        (tauWL1, tauWL2)=self.calcTau(h, interpolate)
+        return (numpy.exp(-2*tauWL1), numpy.exp(-2*tauWL2))
+
+    ####################################
+    ## @brief Uncertainties of alpha and Tau from toy Monte Carlo
+    #
+    #  The noise of each run and wavelength is measured in the background
+    #  windows with the background estimator of reduce, see backgroundNoise,
+    #  e.g. around the fitted trend for linear. Each toy adds gaussian noise to
+    #  the raw signal and to the background, which has an error
+    #  sigma/sqrt(nBkg), then goes through the binning, the Klett inversion
+    #  with the parameters of the last run_Klett and the Tau integration.
+    #  Toys are stacked along a leading axis and processed by chunks of runs
+    #  and toys, within maxBytes of memory.
+    #
+    ## @param self
+    #  the object instance
+    ## @param nToys
+    #  number of toys per run
+    ## @param h
+    #  maximum altitude for the Tau integration
+    ## @param percentiles
+    #  percentiles of the toys distributions to keep
+    ## @param seed
+    #  random seed, None for a random one
+    ## @param maxBytes
+    #  approximate memory budget in bytes
+    ## @return
+    #  a tuple (Tau WL1 bands, Tau WL2 bands) with shape (nPercentiles, nRuns)
+    def toyMC(self, nToys=1000, h=4, percentiles=(16., 50., 84.), seed=None,\
+              maxBytes=TOY_MAX_BYTES):
+        logger.info('Toy Monte Carlo: %d toys for %d runs'%(nToys, self.NRuns))
+        random=numpy.random.RandomState(seed)
+        alpha0=numpy.array((self.Klett_alpha0wl1, self.Klett_alpha0wl2), dtype='d')[:,numpy.newaxis]
+        centers=self.BinsAltCenter[:self.AlphaNBins]
+        binsWidth=self.BinsAltMax-self.BinsAltMin
+        altitude2=self.Alt**2
+        # signal, noise and power of one toy of one run, both wavelengths
+        toyBytes=4*2*self.NData*8
+        nRunsChunk=int(max(1, min(self.NRuns, maxBytes//(nToys*toyBytes))))
+        nToysChunk=int(max(1, min(nToys, maxBytes//(nRunsChunk*toyBytes))))
+        nPercentiles=len(percentiles)
+        alphaBands=numpy.empty((nPercentiles, 2, self.NRuns, self.AlphaNBins), dtype='d')
+        tauBands=numpy.empty((nPercentiles, 2, self.NRuns), dtype='d')
+        for first in range(0, self.NRuns, nRunsChunk):
+            runs=slice(first, min(first+nRunsChunk, self.NRuns))
+            signal=numpy.array((self.RawWL1[runs,self.AltMinIndex:self.AltMaxIndex],\
+                                self.RawWL2[runs,self.AltMinIndex:self.AltMaxIndex]))
+            raw=numpy.array((self.RawWL1[runs], self.RawWL2[runs]))
+            # background subtracted as in reduce, and its noise
+            bkg=estimateBackground(self.RawAltitude, raw, self.BkgWindows, self.BkgMethod,\
+                                   self.Alt)[1]
+            (sigma, nBkg)=backgroundNoise(self.RawAltitude, raw, self.BkgWindows,\
+                                          self.BkgMethod)
+            alpha=numpy.empty((nToys,)+signal.shape[:-1]+(self.AlphaNBins,), dtype='d')
+            tau=numpy.empty((nToys,)+signal.shape[:-1], dtype='d')
+            for start in range(0, nToys, nToysChunk):
+                toys=slice(start, min(start+nToysChunk, nToys))
+                nChunk=toys.stop-toys.start
+                power=random.standard_normal((nChunk,)+signal.shape)
+                power*=sigma[...,numpy.newaxis]
+                power+=signal
+                power-=bkg
+                power-=(random.standard_normal((nChunk,)+sigma.shape)*\
+                        sigma/math.sqrt(nBkg))[...,numpy.newaxis]
+                numpy.abs(power, out=power)
+                power*=altitude2
+                (binned, counts)=binPrefixSums(self.Alt, prefixSums(power), self.BinsAlt)
+                alpha[toys]=klettInversion(binned[...,:self.AlphaNBins], centers, alpha0,\
+                                           self.Klett_k)
+                tau[toys]=opticalDepth(cumulativeTau(alpha[toys], binsWidth),\
+                                       self.BinsAltCenter, h)
+            alphaBands[:,:,runs]=numpy.percentile(alpha, percentiles, axis=0)
+            tauBands[:,:,runs]=numpy.percentile(tau, percentiles, axis=0)
+        self.ToyPercentiles=numpy.array(percentiles, dtype='d')
+        (self.ToyAlphaPW1Bands, self.ToyAlphaPW2Bands)=alphaBands.swapaxes(0, 1)
+        (self.ToyTauWL1Bands, self.ToyTauWL2Bands)=tauBands.swapaxes(0, 1)
+        logger.info('Toy Monte Carlo done.')
+        return (self.ToyTauWL1Bands, self.ToyTauWL2Bands)
+
+    ####################################
+    ## @brief Return the LIDAR_RUN_DICT entries of all runs
+    #
+    ## @param self
+    #  the object instance
+    def dumpToDict(self):
+        return [formatRunDict(self.RunNumbers[i], self.FileNames[i], self.DateTimes[i],\
+                              self.NBins, (self.BkgWL1[i], self.BkgWL2[i]),\
+                              (self.Tau4WL1[i], self.Tau4WL2[i]), self.IsGood[i])\
+                for i in range(self.NRuns)]
+
+
+if __name__ == '__main__':
+    import glob
+    import time
+    start=time.time()
+    batch=pLidarBatch(sorted(glob.glob('alldata/run_0*.root.txt')))
+    print(''.join(batch.dumpToDict()))
+    print('%d runs processed in %.1f s'%(batch.NRuns, time.time()-start))
@@ -0,0 +1,180 @@
+#!/bin/env python
+
+## @file
+#  A binary cache for parsed Lidar raw data.
+#  Parsing ascii or ROOT Lidar files is slow, so the raw arrays are written
+#  once into a small binary file that is memory mapped on later reads.
+
+import os
+import calendar
+import numpy
+from datetime          import datetime, timedelta
+
+from __logging__        import *
+
+## Default cache directory, in the user cache directory so that nothing is
+#  written next to the raw data. A cacheDir of None gives sidecar files.
+LIDAR_CACHE_DIR=os.environ.get('LIDAR_CACHE_DIR',\
+    os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),\
+                 'LidarEyeball'))
+## Default on/off switch, set LIDAR_CACHE=0 to disable the cache
+LIDAR_CACHE_ENABLED=os.environ.get('LIDAR_CACHE', '1')!='0'
+
+####################################
+## @brief Class to manage the binary cache of Lidar raw data
+#
+#  A cache file is made of a fixed size header followed by a (3,N) float64
+#  block holding altitude, WL1 and WL2, so that each column can be mapped
+#  as a contiguous array without any copy.
+#  The cache is invalid as soon as the size or the modification time of the
+#  source file changed.
+#
+class pLidarCache(object):
+
+    ## Cache files extension
+    EXTENSION='.lcache'
+    ## Magic string at the beginning of a cache file
+    MAGIC=b'LIDARCCH'
+    ## Cache format version, increase it when the layout changes
+    VERSION=1
+    ## Layout of the cache file header
+    HEADER=numpy.dtype([('Magic','S8'), ('Version','<i4'), ('RunNumber','<i4'),
+                        ('SrcSize','<i8'), ('SrcMTime','<f8'),
+                        ('DateTime','<i8'), ('NPoints','<i8')])
+    ## Sentinel for missing run number or date
+    UNKNOWN=-1
+
+    ####################################
+    ## @brief Constructor
+    #
+    ## @param self
+    #  the object instance
+    ## @param cacheDir
+    #  directory for the cache files, None to write them next to the data
+    ## @param enabled
+    #  switch the cache on or off
+    def __init__(self, cacheDir=LIDAR_CACHE_DIR, enabled=LIDAR_CACHE_ENABLED):
+        self.CacheDir=cacheDir
+        self.Enabled=enabled
+
+    ####################################
+    ## @brief Get the cache file name for a given data file
+    #
+    ## @param self
+    #  the object instance
+    ## @param filename
+    #  a Lidar data file name
+    def getCachePath(self, filename):
+        if self.CacheDir is None:
+            return filename+self.EXTENSION
+        return os.path.join(self.CacheDir, os.path.basename(filename)+self.EXTENSION)
+
+    ####################################
+    ## @brief Read cached data for a given data file
+    #
+    ## @param self
+    #  the object instance
+    ## @param filename
+    #  a Lidar data file name
+    ## @return
+    #  None if there is no valid cache, a tuple (RunNumber, DateTime, data)
+    #  otherwise, data being a (3,N) memory mapped array
+    def read(self, filename):
+        if not self.Enabled:
+            return None
+        cachePath=self.getCachePath(filename)
+        if not os.path.isfile(cachePath):
+            return None
+        try:
+            srcStat=os.stat(filename)
+            header=numpy.fromfile(cachePath, dtype=self.HEADER, count=1)
+        except (IOError, OSError):
+            return None
+        if len(header)!=1:
+            return None
+        header=header[0]
+        if header['Magic']!=self.MAGIC or header['Version']!=self.VERSION or\
+           header['SrcSize']!=srcStat.st_size or header['SrcMTime']!=srcStat.st_mtime:
+            logger.debug('Cache %s is outdated'%cachePath)
+            return None
+        nPoints=int(header['NPoints'])
+        if os.path.getsize(cachePath)!=self.HEADER.itemsize+3*nPoints*8:
+            logger.warning('Cache %s is truncated'%cachePath)
+            return None
+        # copy on write mode: no copy, but arrays stay writable for ROOT
+        data=numpy.memmap(cachePath, dtype='<f8', mode='c',\
+                          offset=self.HEADER.itemsize, shape=(3,nPoints))
+        runNumber=int(header['RunNumber'])
+        if runNumber==self.UNKNOWN:
+            runNumber=None
+        dateTime=int(header['DateTime'])
+        if dateTime==self.UNKNOWN:
+            dateTime=None
+        else:
+            dateTime=datetime(1970,1,1)+timedelta(seconds=dateTime)
+        logger.debug('Read cache %s'%cachePath)
+        return (runNumber, dateTime, data)
+
+    ####################################
+    ## @brief Write the cache for a given data file
+    #
+    ## @param self
+    #  the object instance
+    ## @param filename
+    #  a Lidar data file name
+    ## @param runNumber
+    #  the run number or None
+    ## @param dateTime
+    #  the run datetime or None
+    ## @param altitude
+    #  raw altitude array
+    ## @param wl1
+    #  raw WL1 array
+    ## @param wl2
+    #  raw WL2 array
+    ## @return
+    #  True if the cache file was written
+    def write(self, filename, runNumber, dateTime, altitude, wl1, wl2):
+        if not self.Enabled:
+            return False
+        cachePath=self.getCachePath(filename)
+        header=numpy.zeros(1, dtype=self.HEADER)
+        header['Magic']=self.MAGIC
+        header['Version']=self.VERSION
+        header['RunNumber']=self.UNKNOWN if runNumber is None else runNumber
+        header['DateTime']=self.UNKNOWN if dateTime is None else\
+                            calendar.timegm(dateTime.timetuple())
+        header['NPoints']=len(altitude)
+        tmpPath='%s.%d.tmp'%(cachePath, os.getpid())
+        try:
+            srcStat=os.stat(filename)
+            header['SrcSize']=srcStat.st_size
+            header['SrcMTime']=srcStat.st_mtime
+            if self.CacheDir is not None and not os.path.isdir(self.CacheDir):
+                os.makedirs(self.CacheDir)
+            out=open(tmpPath,'wb')
+            try:
+                header.tofile(out)
+                numpy.vstack((altitude, wl1, wl2)).astype('<f8').tofile(out)
+            finally:
+                out.close()
+            os.rename(tmpPath, cachePath)
+        except (IOError, OSError) as e:
+            logger.warning('Could not write cache %s: %s'%(cachePath, e))
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+            return False
+        logger.debug('Wrote cache %s'%cachePath)
+        return True
+
+    ####################################
+    ## @brief Remove the cache file for a given data file
+    #
+    ## @param self
+    #  the object instance
+    ## @param filename
+    #  a Lidar data file name
+    def clear(self, filename):
+        cachePath=self.getCachePath(filename)
+        if os.path.exists(cachePath):
+            os.remove(cachePath)
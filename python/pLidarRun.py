@@ -11,6 +11,34 @@ from datetime          import datetime
 
 from __logging__        import *
 from pDataInterface     import *
+from pLidarCache        import pLidarCache
+from lidarAlgorithms    import *
+
+
+####################################
+## @brief Parse a Lidar ascii file in one go
+#
+#  The first line holds the date and time of the run, the following lines
+#  hold three columns: altitude (km), WL1 and WL2 signals.
+#  The whole data block is parsed at C speed with numpy.fromstring.
+#
+## @param filename
+#  a text file name with Lidar data
+## @return
+#  a tuple (datetime, (N,3) float64 contiguous array)
+def loadTxtData(filename):
+    txtFile=open(filename,'r')
+    try:
+        header=txtFile.readline()
+        dateTime=datetime.strptime(header.strip(),'%a %b %d %H:%M:%S %Y')
+        rawData=numpy.fromstring(txtFile.read(), dtype='d', sep=' ')
+    finally:
+        txtFile.close()
+    if rawData.size%3!=0:
+        # extra columns or garbage somewhere, let loadtxt sort it out
+        logger.warning('Irregular data block in %s, using slow parser'%filename)
+        rawData=numpy.loadtxt(filename, dtype='d', skiprows=1, usecols=(0,1,2))
+    return (dateTime, numpy.ascontiguousarray(rawData.reshape((-1,3))))
 
 
 ####################################
@@ -24,11 +52,22 @@ class pLidarRun(object):
     #  the object instance
     ## @param filename
     #  a text file name with Lidar data
-    def __init__(self, filename, process=True, nBins=100):
+    ## @param cache
+    #  a pLidarCache for the raw data, None to use the default one
+    def __init__(self, filename, process=True, nBins=100, cache=None):
         self.FileName=filename
         self.NBins=nBins
         self.RunNumber=None
         self.DateTime=None
+        if cache is None:
+            cache=pLidarCache()
+        self.Cache=cache
+        ## pSashInterface of a ROOT Lidar file, None for text or cached data
+        self.SashInterface=None
+        self.LnPW1=None
+        self.LnPW2=None
+        self.LnPowerPolicy=None
+        self.PrefixSums=None
         self.readFile()
         if process:
             self.process(self.NBins)
@@ -40,6 +79,8 @@ class pLidarRun(object):
     ## @param self
     #  the object instance
     def readFile(self):
+        if self.readCacheFile():
+            return
         # choose which method to call according to file name extension
         ext=os.path.basename(self.FileName).split('.')[-1]
         if ext == 'root':
@@ -50,6 +91,31 @@ class pLidarRun(object):
             logger.error('Unknown file extension: %s'%ext)
             logger.error('Can read only .txt or .root files. Aborting')
             sys.exit(2)
+        self.Cache.write(self.FileName, self.RunNumber, self.DateTime,\
+                         self.RawAltitude, self.RawWL1, self.RawWL2)
+
+    ####################################
+    ## @brief Read Lidar data from the binary cache if it is up to date
+    #
+    ## @param self
+    #  the object instance
+    ## @return
+    #  True if the data were read from the cache
+    def readCacheFile(self):
+        cached=self.Cache.read(self.FileName)
+        if cached is None:
+            return False
+        (self.RunNumber, self.DateTime, data)=cached
+        # no ROOT file is opened when reading the cache
+        self.SashInterface=None
+        logger.info('-'*80)
+        logger.info('Reading cache for %s, Date %s, Run %s'%\
+              (self.FileName,self.DateTime,self.RunNumber))
+        # memory mapped rows, no copy
+        (self.RawAltitude, self.RawWL1, self.RawWL2)=data
+        self.RawData=data.T
+        self.NPoints=data.shape[1]
+        return True
              
     ####################################
     ## @brief Read Lidar data from an ascii file
@@ -57,32 +123,16 @@ class pLidarRun(object):
     ## @param self
     #  the object instance
     def readTxtFile(self):
-        cont=open(self.FileName,'r').readlines()
         self.RunNumber=int(self.FileName.split('_')[1])
-        self.DateTime=datetime.strptime(cont[0].strip(),'%a %b %d %H:%M:%S %Y')
+        (self.DateTime, self.RawData)=loadTxtData(self.FileName)
         logger.info('-'*80)
         logger.info('Reading file %s, Date %s, Run %s'%\
               (self.FileName,self.DateTime,self.RunNumber))
-        self.NPoints=len(cont[1:])
-        self.RawData=numpy.ndarray((self.NPoints,3),'d')
-        self.RawAltitude=numpy.ndarray((self.NPoints),'d')
-        self.RawWL1=numpy.ndarray((self.NPoints),'d')
-        self.RawWL2=numpy.ndarray((self.NPoints),'d')
-        i=0
-        for l in cont[1:]:
-            data=l.split()
-            alt=float(data[0])
-            wl1=float(data[1])
-            wl2=float(data[2])
-            self.RawData[i]=(alt,wl1,wl2)
-            self.RawAltitude[i]=alt
-            self.RawWL1[i]=wl1
-            self.RawWL2[i]=wl2
-            i+=1   
-        #Get pointers to slices for convenience - but TGraph unhappy afterward
-        #self.RawAltitude=self.RawData[:,0]
-        #self.RawWL1=self.RawData[:,1]
-        #self.RawWL2=self.RawData[:,2]
+        self.NPoints=self.RawData.shape[0]
+        # Contiguous copies of the columns, TGraph is unhappy with strided slices
+        self.RawAltitude=self.RawData[:,0].copy()
+        self.RawWL1=self.RawData[:,1].copy()
+        self.RawWL2=self.RawData[:,2].copy()
 
     ####################################
     ## @brief Read Lidar data from HESS ROOT Lidar data file
@@ -97,18 +147,36 @@ class pLidarRun(object):
         self.SashInterface.readLidarFile()
         (self.RawAltitude, self.RawWL1, self.RawWL2)=self.SashInterface.getLidarData()
         self.NPoints=len(self.RawAltitude)
+        self.DateTime=datetime.strptime(self.SashInterface.DateTimeString, '%Y-%m-%d %H:%M:%S')
+        try:
+            self.RunNumber=int(self.SashInterface.getRunHeader().GetRunNum())
+        except Exception as e:
+            # no run data set related to the Lidar one, use the file name
+            logger.warning('No run header for %s (%s), run number from the file name'%\
+                           (self.FileName, e))
+            self.RunNumber=int(os.path.basename(self.FileName).split('_')[1])
+        logger.info('Date %s, Run %s'%(self.DateTime, self.RunNumber))
         return 0
         
     ####################################
     ## @brief Full processing including Klett inversion
+    #  Data are reduced only once, so that processing again with another
+    #  number of bins only costs the binning and the inversion. The log
+    #  power is computed again if the policy changed.
     #
     ## @param self
     #  the object instance
     ## @param nBins
     #  number of bins to use for calculations
-    def process(self, nBins):
-        self.reduce()
-        self.lnPower()
+    ## @param lnPowerPolicy
+    #  what to do with samples without a positive power, see lnPower
+    def process(self, nBins, lnPowerPolicy=DEFAULT_LNPOWER_POLICY):
+        if self.LnPW1 is None:
+            self.reduce()
+            self.lnPower(lnPowerPolicy)
+        elif self.LnPowerPolicy!=lnPowerPolicy:
+            # only the log power and the prefix sums depend on the policy
+            self.lnPower(lnPowerPolicy)
         self.binData(nBins)
         self.run_Klett()       
        
@@ -125,32 +193,57 @@ class pLidarRun(object):
     #  minimum altitude to consider for background estimation
     ## @param bkgmax
     #  maximum altitute to consider for background estimation   
-    def reduce(self,altmin=0.800, altmax=10., bkgmin=20., bkgmax=25.):
+    ## @param bkgMethod
+    #  background estimator, one of BKG_METHODS
+    ## @param bkgWindows
+    #  list of (min, max) background windows, None for (bkgmin, bkgmax) only
+    def reduce(self,altmin=0.800, altmax=10., bkgmin=20., bkgmax=25., bkgMethod='mean',\
+               bkgWindows=None):
         logger.info('Subtract background and produce reduced data and power arrays')
         self.AltMin=altmin
         self.AltMax=altmax
         self.BkgMin=bkgmin
         self.BkgMax=bkgmax
-        self.BkgMinIndex=self.NPoints-sum(self.RawAltitude>self.BkgMin)
-        self.BkgMaxIndex=self.NPoints-sum(self.RawAltitude>self.BkgMax)
-        self.AltMinIndex=self.NPoints-sum(self.RawAltitude>self.AltMin)
-        self.AltMaxIndex=self.NPoints-sum(self.RawAltitude>self.AltMax)
-        self.BkgWL1=self.RawWL1[self.BkgMinIndex:self.BkgMaxIndex].mean()
-        self.BkgWL2=self.RawWL2[self.BkgMinIndex:self.BkgMaxIndex].mean()
-        self.WL1=abs(self.RawWL1[self.AltMinIndex:self.AltMaxIndex]-self.BkgWL1)
-        self.WL2=abs(self.RawWL2[self.AltMinIndex:self.AltMaxIndex]-self.BkgWL2)
+        if bkgWindows is None:
+            bkgWindows=[(bkgmin, bkgmax)]
+        self.BkgWindows=bkgWindows
+        self.BkgMethod=bkgMethod
+        (self.BkgMinIndex, self.BkgMaxIndex)=windowIndices(self.RawAltitude, bkgmin, bkgmax)
+        (self.AltMinIndex, self.AltMaxIndex)=windowIndices(self.RawAltitude, altmin, altmax)
         self.Alt=self.RawAltitude[self.AltMinIndex:self.AltMaxIndex]
+        (self.BkgWL1, bkgWL1)=estimateBackground(self.RawAltitude, self.RawWL1, bkgWindows,\
+                                                 bkgMethod, self.Alt)
+        (self.BkgWL2, bkgWL2)=estimateBackground(self.RawAltitude, self.RawWL2, bkgWindows,\
+                                                 bkgMethod, self.Alt)
+        self.WL1=abs(self.RawWL1[self.AltMinIndex:self.AltMaxIndex]-bkgWL1)
+        self.WL2=abs(self.RawWL2[self.AltMinIndex:self.AltMaxIndex]-bkgWL2)
         self.PW1=self.WL1*self.Alt**2
         self.PW2=self.WL2*self.Alt**2
         self.NData=self.Alt.size
-        
-    def lnPower(self):
+        self.LnPW1=None
+        self.LnPW2=None
+        self.PrefixSums=None
+
+    ####################################
+    ## @brief Calculate Ln of Power
+    #
+    ## @param self
+    #  the object instance
+    ## @param policy
+    #  what to do with samples without a positive power, one of
+    #  LNPOWER_POLICIES, see logPower
+    ## @param floor
+    #  floor value of the power for the floor policy, None for the default
+    def lnPower(self, policy=DEFAULT_LNPOWER_POLICY, floor=None):
         logger.info('Calculate Ln of Power')
-        self.LnPW1=numpy.ndarray((self.NData),'d')
-        self.LnPW2=numpy.ndarray((self.NData),'d')
-        for i in xrange(self.NData):
-            self.LnPW1[i]=math.log(self.PW1[i])
-            self.LnPW2[i]=math.log(self.PW2[i])
+        self.LnPowerPolicy=policy
+        (self.LnPW1, self.ValidPW1)=logPower(self.PW1, policy, floor)
+        (self.LnPW2, self.ValidPW2)=logPower(self.PW2, policy, floor)
+        for (wl, valid) in ((1, self.ValidPW1), (2, self.ValidPW2)):
+            if valid is not None:
+                logger.warning('%d samples of WL%d without a positive power (%s)'%\
+                               (valid.size-numpy.count_nonzero(valid), wl, policy))
+        self.PrefixSums=None
 
     def simplePlot(self, wl=1):
         import ROOT
@@ -162,57 +255,66 @@ class pLidarRun(object):
         self.gLnPower.GetYaxis().SetRangeUser(-4,-1)
         self.gLnPower.Fit('pol1','','',5,10)
 
+    ####################################
+    ## @brief Bin data in log scale
+    #
+    ## @param self
+    #  the object instance
+    ## @param nBins
+    #  number of bins between AltMin and AltMax
     def binData(self, nBins=50):
         logger.info('Bin data')
-        self.NBins=nBins
         # get bin width in Log scale
-        self.BinLnAltWidth=(math.log(self.AltMax)-math.log(self.AltMin))/self.NBins
-        # bins edges array
-        self.BinsAlt=numpy.ndarray((self.NBins+1),'d')
-        for i in range(self.NBins+1):
-            self.BinsAlt[i]=math.exp(math.log(self.AltMin)+i*self.BinLnAltWidth)
+        self.BinLnAltWidth=(math.log(self.AltMax)-math.log(self.AltMin))/nBins
+        self.rebin(logBinEdges(self.AltMin, self.AltMax, nBins))
+        logger.info('Binned data ready.')
+
+    ####################################
+    ## @brief Build the prefix sums of PW and LnPW for both wavelengths
+    #  Done once per reduced data set, then any binning is O(nBins)
+    #
+    ## @param self
+    #  the object instance
+    def buildPrefixSums(self):
+        (self.PrefixSums, self.CountPrefixSums)=\
+            powerPrefixSums((self.PW1, self.PW2), (self.LnPW1, self.LnPW2),\
+                            (self.ValidPW1, self.ValidPW2), self.LnPowerPolicy)
+
+    ####################################
+    ## @brief Bin data with arbitrary bin edges
+    #
+    ## @param self
+    #  the object instance
+    ## @param edges
+    #  increasing altitude bin edges (log, linear or custom)
+    ## @return
+    #  a tuple (BinnedPW1, BinnedPW2, BinnedLnPW1, BinnedLnPW2, BinnedNpoints)
+    def rebin(self, edges):
+        if self.PrefixSums is None:
+            self.buildPrefixSums()
+        self.BinsAlt=numpy.asarray(edges, dtype='d')
+        self.NBins=len(self.BinsAlt)-1
         # bins min, max, center
         self.BinsAltMin=self.BinsAlt[:-1]
         self.BinsAltMax=self.BinsAlt[1:]
-        self.BinsAltCenter=numpy.ndarray((self.NBins),'d')
-        for i in range(self.NBins):
-            self.BinsAltCenter[i]=(self.BinsAlt[i]+self.BinsAlt[i+1])/2.
-        
-        # array to put average PW and LnPw for each bin in altitude    
-        self.BinnedPW1=numpy.ndarray((self.NBins),'d')
-        self.BinnedPW2=numpy.ndarray((self.NBins),'d')
-        self.BinnedLnPW1=numpy.ndarray((self.NBins),'d')
-        self.BinnedLnPW2=numpy.ndarray((self.NBins),'d')
-        self.BinnedNpoints=numpy.ndarray((self.NBins),'d')
-        sumpw1=0
-        sumpw2=0
-        sumlnpw1=0
-        sumlnpw2=0        
-        nPoints=0
-        kAlt=0
-        #print 'Bin \t altMin  altMean altMax  SumPW \t\t NPoints'
-        for alt,pw1,pw2,lnpw1,lnpw2 in zip(self.Alt,self.PW1, self.PW2, self.LnPW1,self.LnPW2):            
-            if alt>self.BinsAlt[kAlt]:
-                sumpw1+=pw1
-                sumpw2+=pw2
-                sumlnpw1+=lnpw1
-                sumlnpw2+=lnpw2
-                nPoints+=1
-            if alt>self.BinsAlt[kAlt+1] or alt==self.Alt[-1]:
-                #print '%d \t %.03f \t %.03f \t %.03f \t %.05f \t %d'%\
-                #(kAlt,self.BinsAlt[kAlt],self.BinsAltCenter[kAlt],self.BinsAlt[kAlt+1], sumpw1, nPoints) 
-                self.BinnedNpoints[kAlt]=nPoints
-                self.BinnedPW1[kAlt]=sumpw1/nPoints
-                self.BinnedPW2[kAlt]=sumpw2/nPoints
-                self.BinnedLnPW1[kAlt]=sumlnpw1/nPoints
-                self.BinnedLnPW2[kAlt]=sumlnpw2/nPoints
-                sumpw1=pw1
-                sumpw2=pw2
-                sumlnpw1=lnpw1
-                sumlnpw2=lnpw2
-                nPoints=1
-                kAlt+=1        
-        logger.info('Binned data ready.')
+        self.BinsAltCenter=(self.BinsAltMin+self.BinsAltMax)/2.
+        # average PW and LnPw for each bin in altitude, both wavelengths at once
+        (binned, counts)=binPrefixSums(self.Alt, self.PrefixSums, self.BinsAlt,\
+                                       self.CountPrefixSums)
+        if self.CountPrefixSums is None:
+            self.BinnedNpoints=counts
+            self.BinnedValidNpoints=None
+        else:
+            # valid points for PW1, PW2, LnPW1 and LnPW2
+            self.BinnedValidNpoints=counts
+            (starts, stops)=binBounds(self.Alt, self.BinsAlt)
+            self.BinnedNpoints=(stops-starts).astype('d')
+        (self.BinnedPW1, self.BinnedPW2, self.BinnedLnPW1, self.BinnedLnPW2)=binned
+        nEmpty=numpy.count_nonzero(self.BinnedNpoints==0)
+        if nEmpty>0:
+            logger.warning('%d empty altitude bins, averages set to NaN'%nEmpty)
+        return (self.BinnedPW1, self.BinnedPW2, self.BinnedLnPW1, self.BinnedLnPW2,\
+                self.BinnedNpoints)
 
     ####################################
     ## @brief Klett implementation
@@ -240,29 +342,20 @@ class pLidarRun(object):
         self.Klett_k=k
         self.Klett_l=l
         # get altitude bin closest to r0, convert to int for TGraph
-        self.AlphaNBins=int(self.NBins-sum(self.BinsAltCenter>r0)-1)
+        self.AlphaNBins=klettNBins(self.BinsAltCenter, r0)
         r0=self.BinsAltCenter[self.AlphaNBins]
+        # invert both wavelengths at once
+        power=numpy.vstack((self.BinnedPW1[:self.AlphaNBins],\
+                            self.BinnedPW2[:self.AlphaNBins]))
+        alpha=klettInversion(power, self.BinsAltCenter[:self.AlphaNBins],\
+                             (alpha0wl1, alpha0wl2), k)
         # array for binned alpha(r)
-        self.BinnedAlphaPW1=numpy.ndarray((self.AlphaNBins),'d')        
-        self.BinnedAlphaPW2=numpy.ndarray((self.AlphaNBins),'d')        
-        # first bin
-        self.BinnedAlphaPW1[self.AlphaNBins-1]=alpha0wl1
-        self.BinnedAlphaPW2[self.AlphaNBins-1]=alpha0wl2
-        # iterate
-        #print 'n   pw \t\t alpha_n \t int_pw \t int_alpha \t binAlt'
-        for i in xrange(self.AlphaNBins-2, -1, -1):
-            # WL1
-            pw_m1=self.BinnedPW1[i+1]
-            alpha_m1=self.BinnedAlphaPW1[i+1]
-            int_pw_m1=(self.BinnedPW1[i+1]+self.BinnedPW1[i])/2.*(self.BinsAltCenter[i+1]-self.BinsAltCenter[i])
-            self.BinnedAlphaPW1[i]=self.BinnedPW1[i]/(pw_m1/alpha_m1-2*int_pw_m1)
-            #print '%d %0.5f \t %.05f \t %.05f \t %.05f \t %.03f'%\
-            #(i, pw_m1, alpha_m1, int_pw_m1, self.BinnedAlphaPW1[i], self.BinsAltCenter[i])
-            # WL2
-            pw_m2=self.BinnedPW2[i+1]
-            alpha_m2=self.BinnedAlphaPW2[i+1]
-            int_pw_m2=(self.BinnedPW2[i+1]+self.BinnedPW2[i])/2.*(self.BinsAltCenter[i+1]-self.BinsAltCenter[i])
-            self.BinnedAlphaPW2[i]=self.BinnedPW2[i]/(pw_m2/alpha_m2-2*int_pw_m2)
+        self.BinnedAlphaPW1=alpha[0]
+        self.BinnedAlphaPW2=alpha[1]
+        # cumulative optical depth, any Tau query is then a lookup
+        binsWidth=self.BinsAltMax-self.BinsAltMin
+        self.CumTau=cumulativeTau(alpha, binsWidth)
+        (self.CumTauWL1, self.CumTauWL2)=self.CumTau
 
         # Truncate BinsAltCenter
         #self.BinsAltCenter= self.BinsAltCenter[:-1]   
@@ -278,12 +371,9 @@ class pLidarRun(object):
     ## @param h
     #  maximum altitude for intergration
     def TauAndQuality(self, h=4):
-        nBinToSum=int(self.AlphaNBins-sum(self.BinsAltCenter>h))
-        self.Tau4WL1=sum(self.BinnedAlphaPW1[:nBinToSum]*(self.BinsAltMax[:nBinToSum]-self.BinsAltMin[:nBinToSum]))        
-        self.Tau4WL2=sum(self.BinnedAlphaPW2[:nBinToSum]*(self.BinsAltMax[:nBinToSum]-self.BinsAltMin[:nBinToSum]))        
-        self.IsGood=True
-        if self.Tau4WL1<0.002 or self.Tau4WL2<0.01:
-            self.IsGood=False
+        (self.Tau4WL1, self.Tau4WL2)=self.calcTau(h)
+        self.IsGood=bool(isGoodRun(self.Tau4WL1, self.Tau4WL2,\
+                                   (self.BinnedLnPW1, self.BinnedLnPW2)))
         return (self.Tau4WL1,self.Tau4WL2)
             
     ####################################
@@ -295,15 +385,36 @@ class pLidarRun(object):
         return self.TauAndQuality(h=4)
 
     ####################################
-    ## @brief Integrate Alpha to get absorption for the first 4 km
-    #  Tau4 in Piron et al
+    ## @brief Absorption for the first h km from the cumulative optical depth
+    #
     ## @param self
     #  the object instance
     ## @param h
-    #  maximum altitude for intergration
-    def calcTransmission(self, h=4):
-        self.calcTau(h)
-        return (math.exp(-2*self.Tau4WL1),math.exp(-2*self.Tau4WL2))
+    #  maximum altitude for intergration, scalar or array
+    ## @param interpolate
+    #  interpolate linearly between the bin edges, else sum whole bins as
+    #  for Tau4
+    ## @return
+    #  a tuple (Tau WL1, Tau WL2), floats or arrays with the shape of h
+    def calcTau(self, h=4, interpolate=False):
+        edges=self.BinsAlt if interpolate else None
+        tau=opticalDepth(self.CumTau, self.BinsAltCenter, h, edges)
+        if tau.ndim==1:
+            return (float(tau[0]), float(tau[1]))
+        return (tau[0], tau[1])
+
+    ####################################
+    ## @brief Transmission probability for the first h km
+    #  exp(-2*Tau), for the way up and back of the light
+    ## @param self
+    #  the object instance
+    ## @param h
+    #  maximum altitude for intergration, scalar or array
+    ## @param interpolate
+    #  interpolate linearly between the bin edges, else sum whole bins
+    def calcTransmission(self, h=4, interpolate=False):
+        (tauWL1, tauWL2)=self.calcTau(h, interpolate)
+        return (numpy.exp(-2*tauWL1), numpy.exp(-2*tauWL2))
         
     ####################################
     ## @brief Return a string for a dictionnary
@@ -311,14 +422,39 @@ class pLidarRun(object):
     ## @param self
     #  the object instance
     def dumpToDict(self):
-        stringDict='%d'%self.RunNumber
-        stringDict+=':{"FileName":"%s","DateTime":"%s", "NBins":%d,'%\
-                     (os.path.basename(self.FileName), self.DateTime, self.NBins)
-        stringDict+='"Bkg":(%.5f,%.5f), "Tau4":(%.5f,%.5f), "IsGood":%s},\n'%\
-                     (self.BkgWL1,self.BkgWL2, self.Tau4WL1, self.Tau4WL2, self.IsGood)
-                     
-        return stringDict
-        
+        return formatRunDict(self.RunNumber, self.FileName, self.DateTime, self.NBins,\
+                             (self.BkgWL1,self.BkgWL2), (self.Tau4WL1,self.Tau4WL2),\
+                             self.IsGood)
+
+####################################
+## @brief Format a run summary as an entry of LIDAR_RUN_DICT
+#
+## @param runNumber
+#  the run number
+## @param fileName
+#  the Lidar data file name
+## @param dateTime
+#  the run datetime
+## @param nBins
+#  number of bins used for the analysis
+## @param bkg
+#  background for WL1 and WL2
+## @param tau4
+#  Tau4 for WL1 and WL2
+## @param isGood
+#  run quality flag, a run with a NaN background or Tau4 is never good
+def formatRunDict(runNumber, fileName, dateTime, nBins, bkg, tau4, isGood):
+    values=tuple(bkg)+tuple(tau4)
+    isGood=bool(isGood) and bool(numpy.all(numpy.isfinite(values)))
+    # a bare nan is not valid python
+    values=tuple('%.5f'%value if numpy.isfinite(value) else 'float("nan")'\
+                 for value in values)
+    stringDict='%d'%runNumber
+    stringDict+=':{"FileName":"%s","DateTime":"%s", "NBins":%d,'%\
+                 (os.path.basename(fileName), dateTime, nBins)
+    stringDict+='"Bkg":(%s,%s), "Tau4":(%s,%s), "IsGood":%s},\n'%(values+(isGood,))
+    return stringDict
+
 if __name__ == '__main__':
     DATA_DIR='/home/bregeon/Hess/Lidar/alldata'
 #    r=pLidarRun(os.path.join(DATA_DIR,'run_065160_Lidar_001.root.txt'), nBins=100)
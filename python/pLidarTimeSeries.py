@@ -0,0 +1,90 @@
+#!/bin/env python
+
+## @file
+#  Evolution of the transmission during a run.
+#  The Lidar profiles of a run are read by chunks of entries and each chunk
+#  goes through the vectorized analysis of pLidarBatch, so that the memory
+#  used does not depend on the length of the run.
+#
+
+import numpy
+
+from __logging__        import *
+from pLidarBatch        import pLidarBatch
+from lidarAlgorithms    import DEFAULT_LNPOWER_POLICY
+
+####################################
+## @brief Class to analyse every Lidar profile of a run
+#
+class pLidarTimeSeries(object):
+    ####################################
+    ## @brief Constructor
+    #
+    ## @param self
+    #  the object instance
+    ## @param chunks
+    #  an iterable of tuples (entries, times, range, signal 532 nm, signal 355 nm)
+    #  as given by pSashInterface.iterLidarChunks
+    ## @param nBins
+    #  number of bins to use for calculations
+    ## @param runNumber
+    #  the run number
+    ## @param lnPowerPolicy
+    #  what to do with samples without a positive power, see pLidarBatch.lnPower
+    def __init__(self, chunks, nBins=100, runNumber=None,\
+                 lnPowerPolicy=DEFAULT_LNPOWER_POLICY):
+        self.Chunks=chunks
+        self.NBins=nBins
+        self.LnPowerPolicy=lnPowerPolicy
+        self.RunNumber=runNumber
+        self.NEntries=0
+
+    ####################################
+    ## @brief Analyse all chunks
+    #
+    ## @param self
+    #  the object instance
+    ## @param h
+    #  maximum altitude for the Tau integration
+    def process(self, h=4):
+        results=dict((key, []) for key in ['Entries', 'Times', 'BkgWL1', 'BkgWL2',\
+                                           'Tau4WL1', 'Tau4WL2', 'IsGood'])
+        for (entries, times, altitude, wl1, wl2) in self.Chunks:
+            batch=pLidarBatch(None, process=False, nBins=self.NBins)
+            batch.setProfiles(altitude, wl1, wl2)
+            batch.reduce()
+            batch.lnPower(self.LnPowerPolicy)
+            batch.binData(self.NBins)
+            batch.run_Klett()
+            batch.TauAndQuality(h)
+            # copies, the chunk buffers are filled again by the next chunk
+            results['Entries'].append(numpy.array(entries))
+            results['Times'].append(numpy.array(times))
+            results['BkgWL1'].append(batch.BkgWL1)
+            results['BkgWL2'].append(batch.BkgWL2)
+            results['Tau4WL1'].append(batch.Tau4WL1)
+            results['Tau4WL2'].append(batch.Tau4WL2)
+            results['IsGood'].append(batch.IsGood)
+            self.NEntries+=batch.NRuns
+            logger.info('%d profiles analysed'%self.NEntries)
+        for (key, values) in results.items():
+            setattr(self, key, numpy.concatenate(values) if len(values)>0 else numpy.zeros(0))
+        return (self.Times, self.Tau4WL1, self.Tau4WL2)
+
+    ####################################
+    ## @brief Transmission probability of each profile
+    #
+    ## @param self
+    #  the object instance
+    def getTransmission(self):
+        return (numpy.exp(-2*self.Tau4WL1), numpy.exp(-2*self.Tau4WL2))
+
+
+if __name__ == '__main__':
+    import sys
+    from pSashInterface import pSashInterface
+    sash=pSashInterface(-1, filename=sys.argv[1])
+    series=pLidarTimeSeries(sash.iterLidarChunks(), nBins=100)
+    series.process()
+    for (t, tau1, tau2) in zip(series.Times, series.Tau4WL1, series.Tau4WL2):
+        print('%d %.5f %.5f'%(t, tau1, tau2))
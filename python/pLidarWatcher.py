@@ -0,0 +1,238 @@
+#!/bin/env python
+
+## @file
+#  Watch a data directory and analyse new Lidar files as soon as they are
+#  complete. The results are appended to a pRunSummaryStore.
+#  Only the run directories that were not ingested yet are polled, and a
+#  run directory is listed again only when its modification time changed.
+#
+
+import os
+import time
+import fnmatch
+
+from __logging__        import *
+from pLidarRun          import pLidarRun
+from pDataInventory     import pDataInventory, listDir, RUN_DIR_RE
+
+## Lidar files that can be analysed, by order of preference
+LIDAR_FILE_PATTERNS=['run_%06d_Lidar_*.root.txt', 'run_%06d_Lidar_*.root']
+
+####################################
+## @brief Class to ingest Lidar runs while they are taken
+#
+class pLidarWatcher(object):
+
+    ####################################
+    ## @brief Constructor
+    #
+    ## @param self
+    #  the object instance
+    ## @param directory
+    #  a directory with one run* directory per run
+    ## @param store
+    #  the pRunSummaryStore to append results to
+    ## @param pollInterval
+    #  seconds between two polls
+    ## @param settleTime
+    #  seconds without any change for a file to be considered as complete
+    ## @param lookback
+    #  run directories modified more than lookback seconds ago are not watched
+    ## @param nBins
+    #  number of bins to use for calculations
+    ## @param cache
+    #  a pLidarCache for the raw data, None to use the default one
+    def __init__(self, directory, store, pollInterval=2., settleTime=2.,\
+                 lookback=12*3600., nBins=100, cache=None):
+        self.Directory=directory
+        self.Store=store
+        self.PollInterval=pollInterval
+        self.SettleTime=settleTime
+        self.Lookback=lookback
+        self.NBins=nBins
+        self.Cache=cache
+        self.Inventory=pDataInventory(directory, cacheFile=None, nThreads=1)
+        ## Runs already in the store
+        self.KnownRuns=set(int(run) for run in store['RunNumber'])
+        ## Runs not watched, too old or that could not be processed
+        self.IgnoredRuns=set()
+        ## Watched run directories by run number
+        self.OpenRuns={}
+        ## Inventory of the watched run directories
+        self.RunFiles={}
+        ## Last (size, mtime) seen for the candidate files
+        self.FileStates={}
+        ## Ingestion latencies in seconds, from the last file change to the store
+        self.Latencies=[]
+        self.DirMTime=None
+
+    ####################################
+    ## @brief Look for new run directories
+    #
+    #  The top directory is listed only when its modification time changed.
+    #
+    ## @param self
+    #  the object instance
+    def updateRunDirs(self):
+        mtime=os.stat(self.Directory).st_mtime
+        if mtime==self.DirMTime:
+            return
+        firstPass=self.DirMTime is None
+        self.DirMTime=mtime
+        now=time.time()
+        for (name, isDir) in listDir(self.Directory):
+            match=RUN_DIR_RE.match(name)
+            if match is None or not isDir:
+                continue
+            run=int(match.group(1))
+            if run in self.KnownRuns or run in self.IgnoredRuns or run in self.OpenRuns:
+                continue
+            dataDir=os.path.join(self.Directory, name)
+            # at start up, leave the old runs alone
+            if firstPass and now-os.stat(dataDir).st_mtime>self.Lookback:
+                self.IgnoredRuns.add(run)
+                continue
+            logger.info('Watching run %d in %s'%(run, dataDir))
+            self.OpenRuns[run]=dataDir
+
+    ####################################
+    ## @brief Find a complete Lidar file in a run directory
+    #
+    ## @param self
+    #  the object instance
+    ## @param run
+    #  the run number
+    ## @param now
+    #  the current time
+    ## @return
+    #  a tuple (file name, last modification time), or None
+    def findCompleteFile(self, run, now):
+        (run, runFiles, scanned)=self.Inventory.scanRunDir((run, self.OpenRuns[run],\
+                                                             self.RunFiles.get(run)))
+        self.RunFiles[run]=runFiles
+        candidates=runFiles['TxtFiles']+runFiles['LidarFiles']
+        for pattern in LIDAR_FILE_PATTERNS:
+            for filename in candidates:
+                if not fnmatch.fnmatchcase(os.path.basename(filename), pattern%run):
+                    continue
+                try:
+                    stat=os.stat(filename)
+                except OSError:
+                    continue
+                state=(stat.st_size, stat.st_mtime)
+                previous=self.FileStates.get(filename)
+                self.FileStates[filename]=state
+                # complete when unchanged since the last poll and for settleTime
+                if state==previous and stat.st_size>0 and now-stat.st_mtime>=self.SettleTime:
+                    return (filename, stat.st_mtime)
+        return None
+
+    ####################################
+    ## @brief Analyse a Lidar file
+    #
+    ## @param self
+    #  the object instance
+    ## @param filename
+    #  the Lidar file name
+    ## @return
+    #  the processed pLidarRun, or None if it failed
+    def processFile(self, filename):
+        try:
+            run=pLidarRun(filename, process=True, nBins=self.NBins, cache=self.Cache)
+            run.calcTau4()
+            return run
+        except (Exception, SystemExit) as e:
+            logger.error('Failed to process %s: %s'%(filename, e))
+            return None
+
+    ####################################
+    ## @brief Poll the data directory once and ingest the complete files
+    #
+    ## @param self
+    #  the object instance
+    ## @return
+    #  list of the run numbers added to the store
+    def poll(self):
+        self.updateRunDirs()
+        now=time.time()
+        done=[]
+        for run in sorted(self.OpenRuns.keys()):
+            try:
+                found=self.findCompleteFile(run, now)
+            except OSError as e:
+                logger.warning('Run %d directory not readable: %s'%(run, e))
+                continue
+            if found is None:
+                # give up on directories without a Lidar file for too long
+                if now-self.RunFiles[run]['MTime']>self.Lookback:
+                    logger.info('No Lidar file for run %d, not watched any more'%run)
+                    self.closeRun(run)
+                    self.IgnoredRuns.add(run)
+                continue
+            (filename, mtime)=found
+            lidarRun=self.processFile(filename)
+            self.closeRun(run)
+            if lidarRun is None:
+                self.IgnoredRuns.add(run)
+                continue
+            try:
+                self.Store.appendRuns([lidarRun])
+            except (Exception, SystemExit) as e:
+                logger.error('Failed to add run %d to the store: %s'%(run, e))
+                self.IgnoredRuns.add(run)
+                continue
+            self.KnownRuns.add(run)
+            latency=time.time()-mtime
+            self.Latencies.append(latency)
+            logger.info('Run %d ingested, Tau4 (%.5f, %.5f), latency %.1f s'%\
+                        (run, lidarRun.Tau4WL1, lidarRun.Tau4WL2, latency))
+            done.append(run)
+        return done
+
+    ####################################
+    ## @brief Stop watching a run directory
+    #
+    ## @param self
+    #  the object instance
+    ## @param run
+    #  the run number
+    def closeRun(self, run):
+        self.OpenRuns.pop(run, None)
+        runFiles=self.RunFiles.pop(run, None)
+        if runFiles is not None:
+            for filename in runFiles['TxtFiles']+runFiles['LidarFiles']:
+                self.FileStates.pop(filename, None)
+
+    ####################################
+    ## @brief Get a summary of the ingestion latencies
+    #
+    ## @param self
+    #  the object instance
+    ## @return
+    #  a tuple (number of runs, mean latency, maximum latency)
+    def getLatencyReport(self):
+        if len(self.Latencies)==0:
+            return (0, 0., 0.)
+        return (len(self.Latencies), sum(self.Latencies)/len(self.Latencies),\
+                max(self.Latencies))
+
+    ####################################
+    ## @brief Poll the data directory until interrupted
+    #
+    ## @param self
+    #  the object instance
+    ## @param maxPolls
+    #  stop after maxPolls polls, None to run forever
+    def watch(self, maxPolls=None):
+        logger.info('Watching %s every %.1f s'%(self.Directory, self.PollInterval))
+        nPolls=0
+        try:
+            while maxPolls is None or nPolls<maxPolls:
+                start=time.time()
+                self.poll()
+                nPolls+=1
+                time.sleep(max(0., self.PollInterval-(time.time()-start)))
+        except KeyboardInterrupt:
+            logger.info('Stopped')
+        logger.info('%d runs ingested, latency mean %.1f s, max %.1f s'%\
+                    self.getLatencyReport())
@@ -5,6 +5,7 @@
 # 
 
 import math
+import numpy
 
 ####################################
 ## @brief Class to manage Rayleigh scattering
@@ -29,7 +30,8 @@ class pRayleigh(object):
     def __init__(self, costheta, Lambda):
         self.CosTheta=costheta
         self.Lambda=Lambda
-        self.getRayleigh(0)    # to initialize RayleighPar0
+        # only depends on the wave length
+        self.RayleighPar0=float(rayleighPar0(Lambda))
         
     ####################################
     ## @brief Rayleigh absorption
@@ -37,13 +39,32 @@ class pRayleigh(object):
     ## @param h
     #  h is the altitude in km
     def getRayleigh(self, h):
-        mlambda = self.Lambda/1000. # convert to microns
-        q1 = 9.4977E-3
-        dum = 1/mlambda**2
-        q2 = 0.23465 + 107.6/(146. - dum) + 0.93161/(41.-dum)
-        self.RayleighPar0 = q1*q2*q2*dum*dum/self.C/self.HR0
         return self.RayleighPar0*math.exp(-(self.CosTheta*h+self.HTHEMIS)/self.HR0)
+
+    ####################################
+    ## @brief Rayleigh absorption for an array of altitudes
+    #
+    ## @param h
+    #  h is an array of altitudes in km
+    def getRayleighArray(self, h):
+        return self.RayleighPar0*numpy.exp(-(self.CosTheta*numpy.asarray(h, dtype='d')+\
+                                             self.HTHEMIS)/self.HR0)
         
+    ####################################
+    ## @brief Altitude for a given Rayleigh absorption, inverse of getRayleigh
+    #
+    #  h = (-HR0*ln(alpha/RayleighPar0) - HTHEMIS)/costheta
+    #
+    ## @param alpha
+    #  the absorption, a scalar or an array
+    ## @param strict
+    #  raise a ValueError for absorptions that are not strictly positive,
+    #  else return NaN for them
+    ## @return
+    #  the altitude in km, with the shape of alpha
+    def getReverseRayleigh(self, alpha, strict=False):
+        return rayleighAltitude(alpha, self.CosTheta, self.Lambda, strict)
+
     ####################################
     ## @brief Rayleigh absorption for ROOT
     #
@@ -62,6 +83,69 @@ class pRayleigh(object):
     def getRayleighPar0(self):
         return self.RayleighPar0
 
+####################################
+## @brief Rayleigh absorption at the site altitude for a given wave length
+#
+## @param Lambda
+#  the wave length in nm, a scalar or an array
+def rayleighPar0(Lambda):
+    mlambda = numpy.asarray(Lambda, dtype='d')/1000. # convert to microns
+    q1 = 9.4977E-3
+    dum = 1/mlambda**2
+    q2 = 0.23465 + 107.6/(146. - dum) + 0.93161/(41.-dum)
+    return q1*q2*q2*dum*dum/pRayleigh.C/pRayleigh.HR0
+
+####################################
+## @brief Rayleigh absorption for all wave lengths, angles and altitudes
+#
+#  The wave length and the angle terms are computed once and combined by
+#  broadcasting.
+#
+## @param h
+#  altitudes in km, array of shape (nH)
+## @param costheta
+#  cosines of the theta angle, array of shape (nCos)
+## @param Lambda
+#  wave lengths in nm, array of shape (nWl)
+## @return
+#  absorption array of shape (nWl, nCos, nH)
+def rayleighExtinction(h, costheta, Lambda):
+    h=numpy.atleast_1d(numpy.asarray(h, dtype='d'))
+    costheta=numpy.atleast_1d(numpy.asarray(costheta, dtype='d'))
+    par0=numpy.atleast_1d(rayleighPar0(Lambda))*math.exp(-pRayleigh.HTHEMIS/pRayleigh.HR0)
+    profile=numpy.exp(-costheta[:,numpy.newaxis]*h[numpy.newaxis,:]/pRayleigh.HR0)
+    return par0[:,numpy.newaxis,numpy.newaxis]*profile[numpy.newaxis,:,:]
+
+####################################
+## @brief Altitude for given Rayleigh absorptions, inverse of rayleighExtinction
+#
+#  Arguments are broadcast together.
+#
+## @param alpha
+#  the absorptions
+## @param costheta
+#  cosines of the theta angle, must be strictly positive
+## @param Lambda
+#  wave lengths in nm
+## @param strict
+#  raise a ValueError for absorptions that are not strictly positive,
+#  else return NaN for them
+## @return
+#  the altitudes in km, a float for scalar arguments
+def rayleighAltitude(alpha, costheta, Lambda, strict=False):
+    alpha=numpy.asarray(alpha, dtype='d')
+    costheta=numpy.asarray(costheta, dtype='d')
+    if numpy.any(costheta<=0):
+        raise ValueError('cos(theta) must be strictly positive')
+    valid=numpy.isfinite(alpha)&(alpha>0)
+    if strict and not numpy.all(valid):
+        raise ValueError('Rayleigh absorption must be strictly positive')
+    ratio=numpy.where(valid, alpha, numpy.nan)/rayleighPar0(Lambda)
+    h=(-pRayleigh.HR0*numpy.log(ratio)-pRayleigh.HTHEMIS)/costheta
+    if h.ndim==0:
+        return float(h)
+    return h
+
 if __name__ == '__main__':
     print 'The Rayleigh scattering handler'
     r=pRayleigh(1,532)
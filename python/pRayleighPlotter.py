@@ -43,8 +43,7 @@ class pRayleighPlotter(object):
 
     def getReverseRayleigh(self, rayleigh):
         # gives back the altitude for a given rayleigh absorption value
-        # I should really invert the function analytically
-        return self.TF1.GetX(rayleigh,0.1,30)  
+        return self.Rayleigh.getReverseRayleigh(rayleigh)
               
     def getReverseRayleighForTF1(self, x, par):
         return self.getReverseRayleigh(x[0])
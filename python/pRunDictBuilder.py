@@ -0,0 +1,360 @@
+#!/bin/env python
+
+## @file
+#  Build the LIDAR_RUN_DICT file with a pool of worker processes.
+#  Finished runs are appended to a partial file as soon as they come back,
+#  so that an interrupted build resumes where it stopped.
+#
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import multiprocessing
+
+from __logging__        import *
+from pLidarRun          import pLidarRun
+from pLidarCache        import pLidarCache
+from lidarAlgorithms    import DEFAULT_LNPOWER_POLICY
+
+## Regular expression to get the file name back from a dictionnary entry
+FILENAME_RE=re.compile(r'"FileName":"([^"]+)"')
+
+## Default processing parameters, named after the pLidarRun attributes
+DEFAULT_PARAMETERS={'NBins':100, 'AltMin':0.8, 'AltMax':10., 'BkgMin':20., 'BkgMax':25.,
+                    'BkgMethod':'mean', 'LnPowerPolicy':DEFAULT_LNPOWER_POLICY,
+                    'Klett_r0':10, 'Klett_alpha0wl1':0.0038, 'Klett_alpha0wl2':0.018,
+                    'Klett_k':1, 'Klett_l':1}
+
+####################################
+## @brief Fingerprint of a data file
+#
+## @param filename
+#  a Lidar data file name
+## @param useHash
+#  also compute the SHA1 of the file content
+## @return
+#  a dictionnary with Size, MTime and Hash (None if useHash is False)
+def fileFingerprint(filename, useHash=False):
+    stat=os.stat(filename)
+    digest=None
+    if useHash:
+        sha=hashlib.sha1()
+        dataFile=open(filename,'rb')
+        try:
+            for block in iter(lambda: dataFile.read(1<<20), b''):
+                sha.update(block)
+        finally:
+            dataFile.close()
+        digest=sha.hexdigest()
+    return {'Size':stat.st_size, 'MTime':stat.st_mtime, 'Hash':digest}
+
+####################################
+## @brief Check whether a file changed since its fingerprint was taken
+#
+#  With hashes, a file that was only touched is not considered as changed.
+#
+## @param old
+#  the stored fingerprint
+## @param new
+#  the current fingerprint
+def fingerprintChanged(old, new):
+    if old['Size']!=new['Size']:
+        return True
+    if old.get('Hash') is not None and new['Hash'] is not None:
+        return old['Hash']!=new['Hash']
+    return old['MTime']!=new['MTime']
+
+####################################
+## @brief Set up the logging of a worker process
+#
+#  Messages are prefixed by the worker name, and also written to a
+#  worker_<pid>.log file if a log directory is given.
+#
+## @param logDir
+#  directory for the worker log files, or None
+def initWorker(logDir=None):
+    formatter=logging.Formatter(">>> [%(processName)s] %(message)s")
+    for handler in logger.handlers:
+        handler.setFormatter(formatter)
+    if logDir is not None:
+        fileHandler=logging.FileHandler(os.path.join(logDir, 'worker_%d.log'%os.getpid()))
+        fileHandler.setLevel(logging.DEBUG)
+        fileHandler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(fileHandler)
+
+####################################
+## @brief Process one Lidar file, this runs in a worker process
+#
+## @param args
+#  a tuple (filename, processing parameters, useCache)
+## @return
+#  a tuple (filename, dictionnary entry or None, error message or None)
+def processRunFile(args):
+    (filename, par, useCache)=args
+    try:
+        run=pLidarRun(filename, process=False, cache=pLidarCache(enabled=useCache))
+        run.reduce(par['AltMin'], par['AltMax'], par['BkgMin'], par['BkgMax'],\
+                   par['BkgMethod'])
+        run.lnPower(par['LnPowerPolicy'])
+        run.binData(par['NBins'])
+        run.run_Klett(par['Klett_r0'], par['Klett_alpha0wl1'], par['Klett_alpha0wl2'],\
+                      par['Klett_k'], par['Klett_l'])
+        run.calcTau4()
+        return (filename, run.dumpToDict(), None)
+    except (Exception, SystemExit) as e:
+        logger.error('Failed to process %s: %s'%(filename, e))
+        return (filename, None, str(e))
+
+####################################
+## @brief Class to build LIDAR_RUN_DICT in parallel
+#
+class pRunDictBuilder(object):
+    ####################################
+    ## @brief Constructor
+    #
+    ## @param self
+    #  the object instance
+    ## @param fileList
+    #  a list of Lidar data file names
+    ## @param outputFile
+    #  the python file to write LIDAR_RUN_DICT to
+    ## @param nWorkers
+    #  number of worker processes
+    ## @param nBins
+    #  number of bins to use for calculations
+    ## @param logDir
+    #  directory for the worker log files, or None
+    ## @param useCache
+    #  use the binary cache of the raw data
+    ## @param parameters
+    #  processing parameters overriding DEFAULT_PARAMETERS
+    ## @param useHash
+    #  add a SHA1 of the content to the file fingerprints
+    def __init__(self, fileList, outputFile='LidarRunDict.py', nWorkers=1, nBins=100,\
+                 logDir=None, useCache=True, parameters=None, useHash=False):
+        self.FileList=sorted(fileList)
+        self.OutputFile=outputFile
+        self.PartialFile=outputFile+'.partial'
+        self.FingerprintFile=outputFile+'.fingerprints.json'
+        self.NWorkers=nWorkers
+        self.Parameters=dict(DEFAULT_PARAMETERS)
+        self.Parameters['NBins']=nBins
+        if parameters is not None:
+            self.Parameters.update(parameters)
+        self.LogDir=logDir
+        self.UseCache=useCache
+        self.UseHash=useHash
+        ## Dictionnary entries by file name
+        self.Entries={}
+        ## Fingerprints and parameters by file name
+        self.Fingerprints={}
+        ## Files that could not be processed
+        self.FailedFiles=[]
+
+    ####################################
+    ## @brief Read the entries of an interrupted build
+    #
+    #  The first line of the partial file holds the processing parameters,
+    #  the entries are only kept if they were built with the current ones.
+    #  Each entry follows the fingerprint of its file, separated by a tab,
+    #  and is dropped if the file changed since.
+    #  The partial file is then rewritten, ready to be appended to.
+    #
+    ## @param self
+    #  the object instance
+    def readPartial(self):
+        header=json.dumps(self.Parameters, sort_keys=True)+'\n'
+        lines=[]
+        if os.path.exists(self.PartialFile):
+            names=dict((os.path.basename(filename), filename) for filename in self.FileList)
+            partial=open(self.PartialFile,'r')
+            try:
+                try:
+                    parameters=json.loads(partial.readline())
+                except ValueError:
+                    parameters=None
+                if parameters!=json.loads(header):
+                    logger.warning('%s was built with other parameters, starting over'%\
+                                   self.PartialFile)
+                else:
+                    for line in partial:
+                        match=FILENAME_RE.search(line)
+                        # skip a last line cut by a crash
+                        if match is None or not line.endswith('},\n') or '\t' not in line:
+                            continue
+                        filename=names.get(match.group(1))
+                        if filename is None:
+                            continue
+                        (fingerprint, entry)=line.split('\t', 1)
+                        try:
+                            fingerprint=json.loads(fingerprint)
+                        except ValueError:
+                            continue
+                        if fingerprintChanged(fingerprint, self.Fingerprints[filename]):
+                            logger.info('%s changed since it was processed'%filename)
+                            continue
+                        lines.append(line)
+                        self.Entries[filename]=entry
+            finally:
+                partial.close()
+            logger.info('Resuming from %s with %d runs done'%(self.PartialFile, len(self.Entries)))
+        # clean up the partial file before appending to it again
+        open(self.PartialFile,'w').writelines([header]+lines)
+
+    ####################################
+    ## @brief Keep the entries of the files and parameters that did not change
+    #
+    ## @param self
+    #  the object instance
+    def readFingerprints(self):
+        if not os.path.exists(self.FingerprintFile):
+            return
+        stored=json.load(open(self.FingerprintFile,'r'))
+        nKept=0
+        for filename in self.FileList:
+            old=stored.get(os.path.basename(filename))
+            if old is None:
+                continue
+            new=self.Fingerprints[filename]
+            if old['Size']==new['Size'] and old['MTime']==new['MTime']:
+                # unchanged file, the stored hash is still good
+                new['Hash']=old.get('Hash')
+            elif self.UseHash and old['Size']==new['Size']:
+                # only hash the files that may just have been touched
+                new=self.Fingerprints[filename]=fileFingerprint(filename, True)
+            if old['Parameters']!=self.Parameters or fingerprintChanged(old, new):
+                continue
+            self.Entries[filename]=old['Entry']
+            nKept+=1
+        logger.info('%d runs up to date in %s'%(nKept, self.FingerprintFile))
+
+    ####################################
+    ## @brief Write the fingerprints, parameters and entries of all runs
+    #
+    ## @param self
+    #  the object instance
+    def writeFingerprints(self):
+        stored={}
+        for (filename, entry) in self.Entries.items():
+            record=dict(self.Fingerprints[filename])
+            record['Parameters']=self.Parameters
+            record['Entry']=entry
+            stored[os.path.basename(filename)]=record
+        tmpFile=self.FingerprintFile+'.tmp'
+        json.dump(stored, open(tmpFile,'w'), indent=1, sort_keys=True)
+        os.rename(tmpFile, self.FingerprintFile)
+
+    ####################################
+    ## @brief Process all files not done yet
+    #
+    ## @param self
+    #  the object instance
+    ## @param incremental
+    #  only process the files or parameters that changed since the last build
+    ## @return
+    #  number of files processed
+    def build(self, incremental=False):
+        # files are hashed only if they are new or changed
+        for filename in self.FileList:
+            self.Fingerprints[filename]=fileFingerprint(filename)
+        if incremental:
+            self.readFingerprints()
+        if self.UseHash:
+            for filename in self.FileList:
+                if self.Fingerprints[filename]['Hash'] is None:
+                    self.Fingerprints[filename]=fileFingerprint(filename, True)
+        self.readPartial()
+        todo=[filename for filename in self.FileList if filename not in self.Entries]
+        logger.info('Processing %d runs with %d workers'%(len(todo), self.NWorkers))
+        if self.LogDir is not None and not os.path.isdir(self.LogDir):
+            os.makedirs(self.LogDir)
+        partial=open(self.PartialFile,'a')
+        try:
+            if len(todo)>0:
+                self.processFiles(todo, partial)
+        finally:
+            partial.close()
+        self.writeOutput()
+        self.writeFingerprints()
+        os.remove(self.PartialFile)
+        if len(self.FailedFiles)>0:
+            logger.warning('Failed runs: %s'%self.FailedFiles)
+        return len(todo)
+
+    ####################################
+    ## @brief Process files with the pool of workers
+    #
+    ## @param self
+    #  the object instance
+    ## @param todo
+    #  list of files to process
+    ## @param partial
+    #  the partial file opened for appending
+    def processFiles(self, todo, partial):
+        pool=multiprocessing.Pool(self.NWorkers, initializer=initWorker,\
+                                  initargs=(self.LogDir,))
+        try:
+            args=[(filename, self.Parameters, self.UseCache) for filename in todo]
+            chunkSize=max(1, min(16, len(todo)//(4*self.NWorkers)))
+            # imap keeps the run order
+            for (filename, entry, error) in pool.imap(processRunFile, args, chunkSize):
+                if entry is None:
+                    self.FailedFiles.append(filename)
+                    continue
+                self.Entries[filename]=entry
+                partial.write(json.dumps(self.Fingerprints[filename], sort_keys=True)+'\t'+entry)
+                partial.flush()
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+    ####################################
+    ## @brief Write LIDAR_RUN_DICT in run order
+    #
+    ## @param self
+    #  the object instance
+    def writeOutput(self):
+        entries=sorted(self.Entries.values(), key=lambda entry: int(entry.split(':')[0]))
+        tmpFile=self.OutputFile+'.tmp'
+        out=open(tmpFile,'w')
+        out.writelines(['LIDAR_RUN_DICT={\n']+entries+['}'])
+        out.close()
+        os.rename(tmpFile, self.OutputFile)
+        logger.info('%d runs written to %s'%(len(entries), self.OutputFile))
+
+####################################
+## @brief Measure the build throughput from 1 to maxWorkers workers
+#
+#  The binary cache is switched off, so that every pass parses the files.
+#
+## @param fileList
+#  a list of Lidar data file names
+## @param maxWorkers
+#  maximum number of worker processes
+## @param nBins
+#  number of bins to use for calculations
+## @return
+#  a list of tuples (nWorkers, seconds, runs per second, speedup)
+def scalingReport(fileList, maxWorkers, nBins=100):
+    import tempfile
+    import shutil
+    tmpDir=tempfile.mkdtemp(prefix='rundict')
+    report=[]
+    try:
+        for nWorkers in range(1, maxWorkers+1):
+            builder=pRunDictBuilder(fileList, os.path.join(tmpDir,'LidarRunDict_%d.py'%nWorkers),\
+                                    nWorkers=nWorkers, nBins=nBins, useCache=False)
+            start=time.time()
+            nRuns=builder.build()
+            elapsed=time.time()-start
+            speedup=report[0][1]/elapsed if len(report)>0 else 1.
+            report.append((nWorkers, elapsed, nRuns/elapsed, speedup))
+    finally:
+        shutil.rmtree(tmpDir)
+    return report
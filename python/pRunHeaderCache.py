@@ -0,0 +1,169 @@
+## @file
+#  A persistent cache of the HESS run headers.
+#  The run header information used by the analysis (target, position,
+#  run type, telescopes) is read once from the ROOT files and kept in a
+#  JSON file, that is read back without ROOT.
+#
+
+import os
+import json
+import atexit
+
+from __logging__ import *
+
+## Run header cache file, None to keep the headers in memory only
+LIDAR_HEADER_CACHE=os.environ.get('LIDAR_HEADER_CACHE', None)
+
+## Shared run header cache, created by getDefaultHeaderCache
+DEFAULT_HEADER_CACHE=None
+
+## Fields of a run header record
+HEADER_FIELDS=['RunNumber', 'Target', 'Theta', 'Phi', 'Beta', 'Lambda', 'RunType',\
+               'NTelsInRun', 'MinTelInTrigger']
+
+####################################
+## @brief Get a run header record from a Sash::RunHeader
+#
+## @param runHeader
+#  a Sash::RunHeader
+## @return
+#  a dictionnary with the HEADER_FIELDS
+def headerToRecord(runHeader):
+    position=runHeader.GetTargetPosition()
+    return {'RunNumber':int(runHeader.GetRunNum()),
+            'Target':str(runHeader.GetTarget()),
+            'Theta':float(position.GetTheta().GetDegrees()),
+            'Phi':float(position.GetPhi().GetDegrees()),
+            'Beta':float(position.GetBeta().GetDegrees()),
+            'Lambda':float(position.GetLambda().GetDegrees()),
+            'RunType':str(runHeader.GetRunType()),
+            'NTelsInRun':int(runHeader.GetNTelsInRun()),
+            'MinTelInTrigger':int(runHeader.GetMinTelInTrigger())}
+
+####################################
+## @brief Summary string of a run header record
+#
+#  Same format as pSashInterface.getSummaryString
+#
+## @param record
+#  a run header record
+def formatHeaderSummary(record):
+    summary = str(record['RunNumber'])
+    summary += ' %15s'%record['Target']
+    summary += ' %03.02f'%record['Theta']
+    summary += ' %03.02f'%record['Phi']
+    summary += ' %03.02f'%record['Beta']
+    summary += ' %03.02f'%record['Lambda']
+    return summary
+
+####################################
+## @brief Class to manage the run header cache
+#
+class pRunHeaderCache(object):
+    ####################################
+    ## @brief Constructor
+    #
+    ## @param self
+    #  the object instance
+    ## @param cacheFile
+    #  the cache file, None to keep the headers in memory only
+    ## @param autoSave
+    #  write the cache file each time a record is added, else call save or
+    #  flush once all records are added
+    def __init__(self, cacheFile=LIDAR_HEADER_CACHE, autoSave=False):
+        self.CacheFile=cacheFile
+        self.AutoSave=autoSave
+        ## Run header records by run number
+        self.Records={}
+        ## True if records were added since the last save
+        self.Modified=False
+        self.load()
+
+    ####################################
+    ## @brief Read the cache file
+    #
+    ## @param self
+    #  the object instance
+    def load(self):
+        if self.CacheFile is None or not os.path.exists(self.CacheFile):
+            return
+        try:
+            cached=json.load(open(self.CacheFile, 'r'))
+        except (IOError, ValueError) as e:
+            logger.warning('Could not read run header cache %s: %s'%(self.CacheFile, e))
+            return
+        for (run, record) in cached.items():
+            # json gives unicode strings with python 2
+            record['Target']=str(record['Target'])
+            record['RunType']=str(record['RunType'])
+            self.Records[int(run)]=record
+
+    ####################################
+    ## @brief Write the cache file
+    #
+    ## @param self
+    #  the object instance
+    def save(self):
+        if self.CacheFile is None:
+            return
+        tmpFile=self.CacheFile+'.tmp'
+        try:
+            json.dump(dict((str(run), record) for (run, record) in self.Records.items()),\
+                      open(tmpFile, 'w'), indent=1, sort_keys=True)
+            os.rename(tmpFile, self.CacheFile)
+            self.Modified=False
+        except (IOError, OSError) as e:
+            logger.warning('Could not write run header cache %s: %s'%(self.CacheFile, e))
+
+    ####################################
+    ## @brief Write the cache file if records were added since the last save
+    #
+    ## @param self
+    #  the object instance
+    def flush(self):
+        if self.Modified:
+            self.save()
+
+    ####################################
+    ## @brief Get the record of a run
+    #
+    ## @param self
+    #  the object instance
+    ## @param run
+    #  a run number
+    ## @return
+    #  the run header record, None if the run is not in the cache
+    def get(self, run):
+        return self.Records.get(int(run))
+
+    ####################################
+    ## @brief Add run header records
+    #
+    ## @param self
+    #  the object instance
+    ## @param records
+    #  a list of run header records
+    def put(self, records):
+        for record in records:
+            self.Records[int(record['RunNumber'])]=record
+        self.Modified=True
+        if self.AutoSave:
+            self.save()
+
+    def __contains__(self, run):
+        return int(run) in self.Records
+
+    def __len__(self):
+        return len(self.Records)
+
+####################################
+## @brief Get the run header cache shared by all objects of the process
+#
+#  The cache is read once from LIDAR_HEADER_CACHE and written back once
+#  at exit if new run headers were added.
+def getDefaultHeaderCache():
+    global DEFAULT_HEADER_CACHE
+    if DEFAULT_HEADER_CACHE is None:
+        DEFAULT_HEADER_CACHE=pRunHeaderCache()
+        atexit.register(DEFAULT_HEADER_CACHE.flush)
+    return DEFAULT_HEADER_CACHE
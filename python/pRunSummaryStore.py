@@ -0,0 +1,334 @@
+#!/bin/env python
+
+## @file
+#  A columnar store for the Lidar runs summary.
+#  Each column of the summary (run number, time, background, Tau4, ...) is
+#  a raw binary file of fixed size items, that is memory mapped on load and
+#  that new runs are appended to.
+#
+
+import os
+import calendar
+import numpy
+from datetime          import datetime, timedelta
+
+from __logging__        import *
+
+## Format of the DateTime strings of LIDAR_RUN_DICT
+DATETIME_FORMAT='%Y-%m-%d %H:%M:%S'
+
+####################################
+## @brief Convert a DateTime string to seconds since epoch
+#
+## @param dateString
+#  date and time as a string '%Y-%m-%d %H:%M:%S'
+def dateToEpoch(dateString):
+    return calendar.timegm(datetime.strptime(dateString, DATETIME_FORMAT).timetuple())
+
+####################################
+## @brief Convert seconds since epoch to a DateTime string
+#
+## @param epoch
+#  seconds since epoch
+def epochToDate(epoch):
+    return (datetime(1970,1,1)+timedelta(seconds=int(epoch))).strftime(DATETIME_FORMAT)
+
+####################################
+## @brief Class to manage the columnar store of runs summary
+#
+class pRunSummaryStore(object):
+
+    ## Columns names and types
+    COLUMNS=[('RunNumber','<i8'), ('Time','<i8'), ('NBins','<i4'),
+             ('BkgWL1','<f8'), ('BkgWL2','<f8'), ('Tau4WL1','<f8'), ('Tau4WL2','<f8'),
+             ('IsGood','|b1'), ('FileName','|S64')]
+    ## Column files extension
+    EXTENSION='.col'
+
+    ####################################
+    ## @brief Constructor
+    #
+    ## @param self
+    #  the object instance
+    ## @param directory
+    #  directory of the column files, None for a store in memory only
+    def __init__(self, directory=None):
+        self.Directory=directory
+        ## Column arrays by name
+        self.Columns={}
+        ## Run indices sorted by time, built on first query
+        self.TimeOrder=None
+        self.SortedTime=None
+        self.load()
+
+    ####################################
+    ## @brief Memory map all columns
+    #
+    #  If a crash happened during an append, the columns are cut to the
+    #  length of the shortest one.
+    #
+    ## @param self
+    #  the object instance
+    def load(self):
+        sizes={}
+        for (name, dtype) in self.COLUMNS:
+            path=self.getColumnPath(name)
+            if path is None or not os.path.exists(path):
+                sizes[name]=0
+            else:
+                sizes[name]=os.path.getsize(path)//numpy.dtype(dtype).itemsize
+        self.NRuns=min(sizes.values())
+        self.TimeOrder=None
+        self.SortedTime=None
+        for (name, dtype) in self.COLUMNS:
+            if self.NRuns==0:
+                self.Columns[name]=numpy.zeros(0, dtype=dtype)
+            else:
+                self.Columns[name]=numpy.memmap(self.getColumnPath(name), dtype=dtype,\
+                                                mode='r', shape=(self.NRuns,))
+        if len(set(sizes.values()))>1:
+            logger.warning('Run summary columns have different lengths, using %d runs'%\
+                           self.NRuns)
+
+    ####################################
+    ## @brief Get the file name of a column
+    #
+    ## @param self
+    #  the object instance
+    ## @param name
+    #  the column name
+    def getColumnPath(self, name):
+        if self.Directory is None:
+            return None
+        return os.path.join(self.Directory, name+self.EXTENSION)
+
+    ####################################
+    ## @brief Get a column array
+    #
+    ## @param self
+    #  the object instance
+    ## @param name
+    #  the column name
+    def __getitem__(self, name):
+        return self.Columns[name]
+
+    def __len__(self):
+        return self.NRuns
+
+    ####################################
+    ## @brief Append runs to the store
+    #
+    ## @param self
+    #  the object instance
+    ## @param columns
+    #  a dictionnary of arrays with the same length for all COLUMNS
+    def append(self, columns):
+        nNew=len(columns['RunNumber'])
+        if nNew==0:
+            return
+        arrays=[]
+        for (name, dtype) in self.COLUMNS:
+            array=numpy.asarray(columns[name])
+            # numpy silently truncates strings longer than the column width
+            if array.dtype.kind in 'SU' and array.dtype.itemsize>0:
+                width=numpy.dtype(dtype).itemsize
+                tooLong=[value for value in array.tolist() if len(value)>width]
+                if tooLong:
+                    raise ValueError('Column %s holds at most %d characters, got %s'%\
+                                     (name, width, tooLong[0]))
+            array=array.astype(dtype)
+            if len(array)!=nNew:
+                raise ValueError('Column %s has %d entries instead of %d'%(name,len(array),nNew))
+            arrays.append((name, array))
+        if self.Directory is None:
+            for (name, array) in arrays:
+                self.Columns[name]=numpy.concatenate((self.Columns[name], array))
+            self.NRuns+=nNew
+            self.TimeOrder=None
+            self.SortedTime=None
+            return
+        if not os.path.isdir(self.Directory):
+            os.makedirs(self.Directory)
+        for (name, array) in arrays:
+            path=self.getColumnPath(name)
+            # drop the tail of a previous interrupted append
+            if os.path.exists(path):
+                itemSize=array.dtype.itemsize
+                if os.path.getsize(path)!=self.NRuns*itemSize:
+                    open(path,'r+b').truncate(self.NRuns*itemSize)
+            out=open(path,'ab')
+            array.tofile(out)
+            out.close()
+        self.load()
+
+    ####################################
+    ## @brief Append runs given in the LIDAR_RUN_DICT format
+    #
+    ## @param self
+    #  the object instance
+    ## @param runDict
+    #  a dictionnary as LIDAR_RUN_DICT
+    def appendDict(self, runDict):
+        self.append(dictToColumns(runDict))
+
+    ####################################
+    ## @brief Append processed runs
+    #
+    ## @param self
+    #  the object instance
+    ## @param runs
+    #  a list of pLidarRun objects with Tau4 calculated
+    def appendRuns(self, runs):
+        self.append({'RunNumber':[run.RunNumber for run in runs],
+                     'Time':[dateToEpoch('%s'%run.DateTime) for run in runs],
+                     'NBins':[run.NBins for run in runs],
+                     'BkgWL1':[run.BkgWL1 for run in runs],
+                     'BkgWL2':[run.BkgWL2 for run in runs],
+                     'Tau4WL1':[run.Tau4WL1 for run in runs],
+                     'Tau4WL2':[run.Tau4WL2 for run in runs],
+                     'IsGood':[run.IsGood for run in runs],
+                     'FileName':[os.path.basename(run.FileName) for run in runs]})
+
+    ####################################
+    ## @brief Convert the store to the LIDAR_RUN_DICT format
+    #
+    ## @param self
+    #  the object instance
+    def toDict(self):
+        runDict={}
+        cols=self.Columns
+        for i in range(self.NRuns):
+            fileName=cols['FileName'][i]
+            if not isinstance(fileName, str):
+                fileName=fileName.decode('ascii')
+            runDict[int(cols['RunNumber'][i])]={'FileName':fileName,\
+                'DateTime':epochToDate(cols['Time'][i]), 'NBins':int(cols['NBins'][i]),\
+                'Bkg':(float(cols['BkgWL1'][i]), float(cols['BkgWL2'][i])),\
+                'Tau4':(float(cols['Tau4WL1'][i]), float(cols['Tau4WL2'][i])),\
+                'IsGood':bool(cols['IsGood'][i])}
+        return runDict
+
+    ####################################
+    ## @brief Get the run indices sorted by time
+    #
+    #  The index is built once and kept until the store changes.
+    #
+    ## @param self
+    #  the object instance
+    ## @return
+    #  a tuple (run indices in time order, sorted times)
+    def getTimeIndex(self):
+        if self.TimeOrder is None:
+            self.TimeOrder=numpy.argsort(self.Columns['Time'], kind='mergesort')
+            self.SortedTime=numpy.asarray(self.Columns['Time'])[self.TimeOrder]
+        return (self.TimeOrder, self.SortedTime)
+
+    ####################################
+    ## @brief Get run numbers in a time range
+    #
+    #  The range is found by bisection in the time index.
+    #
+    ## @param self
+    #  the object instance
+    ## @param timeMin
+    #  start time in seconds since epoch, included
+    ## @param timeMax
+    #  stop time in seconds since epoch, included
+    ## @param goodOnly
+    #  keep only good runs
+    ## @return
+    #  sorted list of run numbers
+    def selectRuns(self, timeMin, timeMax, goodOnly=False):
+        (order, sortedTime)=self.getTimeIndex()
+        first=numpy.searchsorted(sortedTime, timeMin, side='left')
+        last=numpy.searchsorted(sortedTime, timeMax, side='right')
+        index=order[first:last]
+        if goodOnly:
+            index=index[self.Columns['IsGood'][index]]
+        return [int(run) for run in numpy.unique(self.Columns['RunNumber'][index])]
+
+    ####################################
+    ## @brief Split all runs into observing nights in one pass
+    #
+    #  A night starts every day at startHour and lasts duration seconds, as
+    #  in toolBox.getRunsForNight. Runs outside of any night are dropped.
+    #
+    ## @param self
+    #  the object instance
+    ## @param startHour
+    #  hour (UTC) at which a night starts
+    ## @param duration
+    #  length of a night in seconds
+    ## @param goodOnly
+    #  keep only good runs
+    ## @return
+    #  a list of tuples (night start as '%Y-%m-%d %H:%M:%S', sorted run numbers)
+    def partitionNights(self, startHour=16, duration=16*3600, goodOnly=False):
+        time=numpy.asarray(self.Columns['Time'])
+        runs=numpy.asarray(self.Columns['RunNumber'])
+        offset=startHour*3600
+        nightStart=(time-offset)//86400*86400+offset
+        mask=(time-nightStart)<=duration
+        if goodOnly:
+            mask&=self.Columns['IsGood']
+        nightStart=nightStart[mask]
+        runs=runs[mask]
+        order=numpy.lexsort((runs, nightStart))
+        nightStart=nightStart[order]
+        runs=runs[order]
+        # drop duplicated runs, then split where the night changes
+        keep=numpy.ones(runs.size, dtype=bool)
+        keep[1:]=(runs[1:]!=runs[:-1])|(nightStart[1:]!=nightStart[:-1])
+        nightStart=nightStart[keep]
+        runs=runs[keep]
+        if runs.size==0:
+            return []
+        splits=numpy.flatnonzero(numpy.diff(nightStart))+1
+        starts=nightStart[numpy.concatenate(([0], splits))]
+        return [(epochToDate(start), [int(run) for run in nightRuns])\
+                for (start, nightRuns) in zip(starts, numpy.split(runs, splits))]
+
+####################################
+## @brief Convert a LIDAR_RUN_DICT like dictionnary to columns
+#
+## @param runDict
+#  a dictionnary as LIDAR_RUN_DICT
+## @return
+#  a dictionnary of column arrays, in run order
+def dictToColumns(runDict):
+    runs=sorted(runDict.keys())
+    values=[runDict[run] for run in runs]
+    return {'RunNumber':numpy.array(runs, dtype='<i8'),
+            'Time':numpy.array([dateToEpoch(val['DateTime']) for val in values], dtype='<i8'),
+            'NBins':numpy.array([val['NBins'] for val in values], dtype='<i4'),
+            'BkgWL1':numpy.array([val['Bkg'][0] for val in values], dtype='<f8'),
+            'BkgWL2':numpy.array([val['Bkg'][1] for val in values], dtype='<f8'),
+            'Tau4WL1':numpy.array([val['Tau4'][0] for val in values], dtype='<f8'),
+            'Tau4WL2':numpy.array([val['Tau4'][1] for val in values], dtype='<f8'),
+            'IsGood':numpy.array([val['IsGood'] for val in values], dtype='|b1'),
+            'FileName':numpy.array([val['FileName'] for val in values])}
+
+
+if __name__ == '__main__':
+    # Convert LIDAR_RUN_DICT to a store, or a store back to a dictionnary file
+    import sys
+    if len(sys.argv)==3 and sys.argv[1]=='--to-dict':
+        from pLidarRun import formatRunDict
+        store=pRunSummaryStore(sys.argv[2])
+        runDict=store.toDict()
+        sys.stdout.write('LIDAR_RUN_DICT={\n')
+        for run in sorted(runDict.keys()):
+            val=runDict[run]
+            sys.stdout.write(formatRunDict(run, val['FileName'], val['DateTime'], val['NBins'],\
+                                           val['Bkg'], val['Tau4'], val['IsGood']))
+        sys.stdout.write('}')
+    elif len(sys.argv)==2:
+        from LidarRunDict import LIDAR_RUN_DICT
+        store=pRunSummaryStore(sys.argv[1])
+        if len(store)>0:
+            logger.error('%s is not empty, aborting'%sys.argv[1])
+            sys.exit(1)
+        store.appendDict(LIDAR_RUN_DICT)
+        logger.info('%d runs in %s'%(len(store), sys.argv[1]))
+    else:
+        print('Usage: %s [--to-dict] store_directory'%sys.argv[0])
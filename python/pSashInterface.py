@@ -12,6 +12,29 @@ from datetime       import datetime
 
 from __logging__    import *
 from pDataInterface import *
+from rootArrays     import tarrayToNumpy, readLidarEntries, iterLidarChunks
+from pRunSummaryStore import dateToEpoch
+from pRunHeaderCache import getDefaultHeaderCache, headerToRecord, formatHeaderSummary
+
+####################################
+## @brief Load dependencies as HESS ROOT libraries, only once per process
+#
+def loadHessLibs():
+    # Check if library is already available
+    if 'libatmosphere.so' in ROOT.gSystem.GetLibraries():
+        return 0
+    # Check if HESSROOT is defined... no hope otherwise.
+    if 'HESSROOT' not in os.environ:
+        logger.error('$HESSROOT is not set, HESS software is needed for this code to run.')
+        logger.error('Aborting...')
+        sys.exit(1)
+    # To read a LidarEvent, actually loads plenty of other libraries including
+    # Sash:DataSet
+    if ROOT.gSystem.Load("libatmosphere")!=0:
+        logger.error('libatmosphere.so could not be loaded.\nAborting...')
+        sys.exit(1)
+    logger.info('Successfuly loaded HESS software libraries.')
+    return 0
 
 ####################################
 ## @brief Class to interface to Sash:DataSet
@@ -24,7 +47,13 @@ class pSashInterface(object):
     #  the object instance
     ## @param run
     #  a HESS data run number
-    def __init__(self, run, filename=None):
+    ## @param filename
+    #  a Lidar file name, to bypass the data interface
+    ## @param dataInterface
+    #  a pDataInterface knowing the run, None to create one
+    ## @param headerCache
+    #  a pRunHeaderCache, None to use the default one
+    def __init__(self, run, filename=None, dataInterface=None, headerCache=None):
         ## A HESS data run number
         self.RunNumber=run
         ## pDataInterface to get data for current run
@@ -32,8 +61,10 @@ class pSashInterface(object):
         ## Dictionnary to access to data files for current run
         self.DataRunDict={}
         # By-pass for convenience
-        if filename is None:            
-            self.DataInterface=pDataInterface(runsList=[run])
+        if filename is None:
+            if dataInterface is None:
+                dataInterface=pDataInterface(runsList=[run])
+            self.DataInterface=dataInterface
             self.DataRunDict=self.DataInterface.AllRunsDict[run]
         else:
             self.DataRunDict['LidarFiles']=[filename]
@@ -41,6 +72,12 @@ class pSashInterface(object):
         self.DateTime=None
         ## Pointer to the data run header that contains the target information
         self.RunHeader=None
+        ## Cache of the run headers information
+        if headerCache is None:
+            headerCache=getDefaultHeaderCache()
+        self.HeaderCache=headerCache
+        ## Run header information as a dictionnary
+        self.RunHeaderRecord=None
         ## Lidar Sash::DataSet
         self.LidarDataSet=None
         ## Event Sash::EventDataSet
@@ -57,21 +94,7 @@ class pSashInterface(object):
     ## @param self
     #  the object instance
     def __loadLibs__(self):     
-        # Check if library is already available
-        if 'libatmosphere.so' in ROOT.gSystem.GetLibraries():
-            return 0
-        # Check if HESSROOT is defined... no hope otherwise.
-        if not os.environ.has_key('HESSROOT'):
-            logger.error('$HESSROOT is not set, HESS software is needed for this code to run.')
-            logger.error('Aborting...')
-            sys.exit(1)
-        # To read a LidarEvent, actually loads plenty of other libraries including
-        # Sash:DataSet
-        if ROOT.gSystem.Load("libatmosphere")!=0:
-            logger.error('libatmosphere.so could not be loaded.\nAborting...')
-            sys.exit(1)
-        logger.info('Successfuly loaded HESS software libraries.')
-        return 0
+        return loadHessLibs()
 
     ####################################
     ## @brief Open ROOT File and get all Sash::DataSet and HESSArray
@@ -157,8 +180,7 @@ class pSashInterface(object):
         # Need to convert to datetime
         utc=self.LidarDataSet.GetTimeStamp(0).GetUTC()
         self.DateTime=utc
-        self.DateTimeString='%s %02d:%02d:%02d'%(utc.GetDate(), utc.GetHour(),\
-                     utc.GetMinute(), utc.GetSecond())
+        self.DateTimeString=self.getEntryDateString(0)
         logger.info("Run DateTime: %s"%self.DateTimeString)
         # Get Lidar tree and get branched to numpy arrays
         self.LidarTree=self.LidarDataSet.GetTree()
@@ -166,23 +188,76 @@ class pSashInterface(object):
         blue=self.LidarTree.LidarEvent.GetSignal355()
         height=self.LidarTree.LidarEvent.GetRange()
 
-        ## Number of points of the Lidar data acquisition
-        self.LidarNPoints=height.fN
         ## Lidar data Altitude array in km
-        self.LidarRawAltitude=numpy.ndarray((self.LidarNPoints),'d')
+        self.LidarRawAltitude=tarrayToNumpy(height, copy=False).astype('d')
         ## Lidar data raw signal array for green light
-        self.LidarRawWL1=numpy.ndarray((self.LidarNPoints),'d')
+        self.LidarRawWL1=tarrayToNumpy(green, copy=False).astype('d')
         ## Lidar data raw signal array for blue light
-        self.LidarRawWL2=numpy.ndarray((self.LidarNPoints),'d')
+        self.LidarRawWL2=tarrayToNumpy(blue, copy=False).astype('d')
+        ## Number of points of the Lidar data acquisition
+        self.LidarNPoints=self.LidarRawAltitude.size
 
-        for i in range(self.LidarNPoints):
-            self.LidarRawAltitude[i]=height[i]
-            self.LidarRawWL1[i]=green[i]
-            self.LidarRawWL2[i]=blue[i]
-            
         logger.info('%s points read'%self.LidarNPoints)
         return 0
 
+    ####################################
+    ## @brief Date and time of a Lidar entry as a string '%Y-%m-%d %H:%M:%S'
+    #
+    ## @param self
+    #  the object instance
+    ## @param entry
+    #  the entry number
+    def getEntryDateString(self, entry):
+        utc=self.LidarDataSet.GetTimeStamp(entry).GetUTC()
+        return '%s %02d:%02d:%02d'%(utc.GetDate(), utc.GetHour(),\
+                                    utc.GetMinute(), utc.GetSecond())
+
+    ####################################
+    ## @brief Time of a Lidar entry in seconds since epoch
+    #
+    ## @param self
+    #  the object instance
+    ## @param entry
+    #  the entry number
+    def getEntryTime(self, entry):
+        return dateToEpoch(self.getEntryDateString(entry))
+
+    ####################################
+    ## @brief Read the Lidar profiles of the tree by chunks of entries
+    #
+    #  See rootArrays.iterLidarChunks, the arrays of a chunk are only valid
+    #  until the next chunk is read.
+    #
+    ## @param self
+    #  the object instance
+    ## @param chunkSize
+    #  number of entries per chunk
+    ## @return
+    #  a generator of tuples (entries, times, range, signal 532 nm, signal 355 nm)
+    def iterLidarChunks(self, chunkSize=256):
+        if self.LidarDataSet is None:
+            self.createSashDataSet(dtypes=['Lidar'])
+        self.LidarTree=self.LidarDataSet.GetTree()
+        return iterLidarChunks(self.LidarTree, chunkSize, entryTime=self.getEntryTime)
+
+    ####################################
+    ## @brief Read the Lidar profiles of all entries of the tree
+    #
+    ## @param self
+    #  the object instance
+    ## @param entries
+    #  list of entries to read, None for all entries
+    ## @return
+    #  a tuple (range, signal 532 nm, signal 355 nm), the signals have
+    #  one row per entry
+    def readLidarEntries(self, entries=None):
+        if self.LidarDataSet is None:
+            self.createSashDataSet(dtypes=['Lidar'])
+        self.LidarTree=self.LidarDataSet.GetTree()
+        (height, green, blue)=readLidarEntries(self.LidarTree, entries)
+        logger.info('%d profiles of %d points read'%(green.shape[0], height.size))
+        return (height, green, blue)
+
     ####################################
     ## @brief Returns Lidar Data
     #
@@ -227,15 +302,27 @@ class pSashInterface(object):
     #  the object instance
 
     def getSummaryString(self):
-        summary = str(self.getRunNum())
-        summary += ' %15s'%self.getRunHeader().GetTarget()
-        summary += ' %03.02f'%self.getRunHeader().GetTargetPosition().GetTheta().GetDegrees()
-        summary += ' %03.02f'%self.getRunHeader().GetTargetPosition().GetPhi().GetDegrees()
-        summary += ' %03.02f'%self.getRunHeader().GetTargetPosition().GetBeta().GetDegrees()
-        summary += ' %03.02f'%self.getRunHeader().GetTargetPosition().GetLambda().GetDegrees()                        
-        self.SummaryString=summary
+        self.SummaryString=formatHeaderSummary(self.getRunHeaderRecord())
         return self.SummaryString
 
+    ####################################
+    ## @brief Returns the run header information as a dictionnary,
+    #  from the run header cache if the run is there
+    #
+    ## @param self
+    #  the object instance
+
+    def getRunHeaderRecord(self):
+        if self.RunHeaderRecord is None:
+            if self.RunNumber is not None and self.RunNumber>0:
+                self.RunHeaderRecord=self.HeaderCache.get(self.RunNumber)
+        if self.RunHeaderRecord is None:
+            if self.LidarDataSet is None:
+                self.createSashDataSet(dtypes=['Lidar'])
+            self.RunHeaderRecord=headerToRecord(self.getRunHeader())
+            self.HeaderCache.put([self.RunHeaderRecord])
+        return self.RunHeaderRecord
+
 
     ####################################
     ## @brief Loop over events
@@ -5,12 +5,16 @@
 
 import os
 import ROOT
+import numpy
 
 from datetime       import datetime
 
 from __logging__    import *
 from pDataInterface import *
 from pSashInterface import *
+from rootArrays     import bufferToNumpy
+from triggerAlgorithms import *
+from pRunHeaderCache import getDefaultHeaderCache, formatHeaderSummary
 
 
 ####################################
@@ -24,8 +28,12 @@ class pTriggerRate(object):
     #  the object instance
     ## @param runNumber
     #  a runNumber, e.g. 67227
+    ## @param dataInterface
+    #  a pDataInterface knowing the run, None to create one
+    ## @param headerCache
+    #  a pRunHeaderCache, None to use the default one
     #  
-    def __init__(self, runNumber):
+    def __init__(self, runNumber, dataInterface=None, headerCache=None):
         ## run number
         self.RunNumber=runNumber
         ## "events_tree" TChain of Camera files
@@ -34,10 +42,28 @@ class pTriggerRate(object):
         self.hTrgRate=None
         ## Average trigger rate obtained by a fit of hTrgRate with a constant
         self.AverageTriggerRate=-1
+        ## Events per bin of the time stamps, with the binning of hTrgRate
+        self.TriggerCounts=None
+        ## Moving average of TriggerCounts
+        self.RollingTriggerRate=None
         ## Canvas to plot the histogram of time stamps
         self.TrigCan=None
+        ## Cache of the run headers information
+        if headerCache is None:
+            headerCache=getDefaultHeaderCache()
+        self.HeaderCache=headerCache
+        ## Run header information as a dictionnary
+        self.RunHeaderRecord=None
+        ## pSashInterface of the Lidar file, only opened if the run header
+        #  is not in HeaderCache
+        self.LidarSashInterface=None
+        ## Sash::RunHeader of the run, None if the run header was found in
+        #  HeaderCache, use RunHeaderRecord instead
+        self.RunHeader=None
         ## Interface to get the run data files
-        self.DataInterface=pDataInterface(runsList=[runNumber])
+        if dataInterface is None:
+            dataInterface=pDataInterface(runsList=[runNumber])
+        self.DataInterface=dataInterface
         ## Dictionnary with run files information
         self.DataRunDict=self.DataInterface.AllRunsDict[runNumber]
 
@@ -77,7 +103,7 @@ class pTriggerRate(object):
         logger.info('Fill raw trigger rate histogram for run %06d'%self.RunNumber)
         hName="hTrgRate_%d"%self.RunNumber
         hTitle="Trigger Rate for run %d"%self.RunNumber
-        self.hTrgRate=ROOT.TH1F(hName, hTitle, 4000,-2000,1900)
+        self.hTrgRate=ROOT.TH1F(hName, hTitle, *TRIGGER_BINS)
         self.hTrgRate.GetXaxis().SetTitle("Seconds from run start")
         self.hTrgRate.GetYaxis().SetTitle("Raw Trigger rate (Hz)")         
         self.EventsChain.Project(hName,"fTime+1e-9*fNanosec-%f"%self.tStart)
@@ -88,6 +114,63 @@ class pTriggerRate(object):
         logger.info("Run %s Average Trigger Rate: %.02f"%\
                      (self.RunNumber,self.AverageTriggerRate))
     
+    ####################################
+    ## @brief Read the event time stamps by chunks
+    #
+    #  Each chunk is drawn from the TChain without graphics and read from
+    #  the TTree buffer with no copy.
+    #
+    ## @param self
+    #  the object instance
+    ## @param chunkSize
+    #  number of events per chunk
+    ## @return
+    #  a generator of arrays of time stamps in seconds from the run start
+    def iterTimeChunks(self, chunkSize=1000000):
+        self.EventsChain.SetEstimate(chunkSize)
+        nEntries=int(self.EventsChain.GetEntries())
+        for first in range(0, nEntries, chunkSize):
+            n=self.EventsChain.Draw("fTime+1e-9*fNanosec-%f"%self.tStart, "", "goff",\
+                                    chunkSize, first)
+            if n<=0:
+                continue
+            yield bufferToNumpy(self.EventsChain.GetV1(), n)
+
+    ####################################
+    ## @brief Count time stamps in the bins of hTrgRate with numpy
+    #  and get the average rate without a fit
+    #
+    #  The average is the one a fit with a constant would give.
+    #
+    ## @param self
+    #  the object instance
+    ## @param chunkSize
+    #  number of events per chunk
+    ## @param window
+    #  number of bins of the moving average
+    def computeTriggerRate(self, chunkSize=1000000, window=60):
+        logger.info('Compute raw trigger rate for run %06d'%self.RunNumber)
+        self.TriggerCounts=countTimeChunks(self.iterTimeChunks(chunkSize), *TRIGGER_BINS)
+        self.AverageTriggerRate=fitConstantRate(self.TriggerCounts)
+        self.RollingTriggerRate=rollingRate(self.TriggerCounts, window)
+        logger.info("Run %s Average Trigger Rate: %.02f"%\
+                     (self.RunNumber,self.AverageTriggerRate))
+
+    ####################################
+    ## @brief Create the histogram of time stamps from TriggerCounts
+    #
+    ## @param self
+    #  the object instance
+    def fillTriggerRateHisto(self):
+        hName="hTrgRate_%d"%self.RunNumber
+        hTitle="Trigger Rate for run %d"%self.RunNumber
+        self.hTrgRate=ROOT.TH1F(hName, hTitle, *TRIGGER_BINS)
+        self.hTrgRate.GetXaxis().SetTitle("Seconds from run start")
+        self.hTrgRate.GetYaxis().SetTitle("Raw Trigger rate (Hz)")
+        for (i, count) in enumerate(self.TriggerCounts):
+            self.hTrgRate.SetBinContent(i+1, count)
+        self.hTrgRate.SetMaximum(250)
+
     ####################################
     ## @brief Create a histogram of time stamps with 1 s bins
     #  and fit it with a constant
@@ -96,15 +179,20 @@ class pTriggerRate(object):
     #  the object instance
     def averageCorrectedTriggerRate(self):
         logger.info('Estimate the averaged corrected trigger rate for run %06d'%self.RunNumber)
-        # create raw trigger rate histogram if it does not exist
-        if self.hTrgRate is None:
-            self.fillRawTriggerRate()
+        # compute raw trigger rate if not done yet
+        if self.AverageTriggerRate<0:
+            self.computeTriggerRate()
         
-        self.LidarSashInterface=pSashInterface(self.RunNumber)
-        self.LidarSashInterface.readLidarFile()
-        logger.info(self.LidarSashInterface.getSummaryString())
-        self.RunHeader=self.LidarSashInterface.getRunHeader()
-        theta=self.RunHeader.GetTargetPosition().GetTheta().GetDegrees()
+        # the Lidar file is opened only if the run header is not in the cache
+        self.RunHeaderRecord=self.HeaderCache.get(self.RunNumber)
+        if self.RunHeaderRecord is None:
+            self.LidarSashInterface=pSashInterface(self.RunNumber,\
+                                                   dataInterface=self.DataInterface,\
+                                                   headerCache=self.HeaderCache)
+            self.RunHeaderRecord=self.LidarSashInterface.getRunHeaderRecord()
+            self.RunHeader=self.LidarSashInterface.getRunHeader()
+        logger.info(formatHeaderSummary(self.RunHeaderRecord))
+        theta=self.RunHeaderRecord['Theta']
         cor=ROOT.TMath.Cos(theta*ROOT.TMath.DegToRad())
         self.AverageCorrectedTriggerRate=self.AverageTriggerRate*cor
         logger.info("Run %s Average Corrected Trigger Rate: %.02f"%\
@@ -125,6 +213,8 @@ class pTriggerRate(object):
                                         30,50,850,650)
         else:
             gPad.cd()
+        if self.hTrgRate is None:
+            self.fillTriggerRateHisto()
         self.hTrgRate.Draw()
                                          
 
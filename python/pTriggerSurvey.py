@@ -0,0 +1,146 @@
+#!/bin/env python
+
+## @file
+#  Trigger rates of many runs with a pool of worker processes.
+#  The data directory is hashed once, and every worker loads the HESS
+#  libraries once and then processes as many runs as it is given.
+#
+
+import multiprocessing
+
+from __logging__        import *
+from pDataInterface     import *
+from pDataInventory     import LIDAR_INVENTORY_CACHE
+from pRunHeaderCache    import pRunHeaderCache, LIDAR_HEADER_CACHE
+
+## Columns of the survey table
+SURVEY_COLUMNS=['Run', 'Target', 'Theta', 'RawRate', 'CorrectedRate']
+
+## pDataInterface of a worker process, set by initSurveyWorker
+WORKER_DATA_INTERFACE=None
+## pRunHeaderCache of a worker process, set by initSurveyWorker
+WORKER_HEADER_CACHE=None
+
+####################################
+## @brief Set up a worker process
+#
+#  ROOT and the HESS libraries are imported and loaded here, once per worker.
+#
+## @param dataInterface
+#  the pDataInterface shared by all runs
+## @param headerCache
+#  the pRunHeaderCache, workers only read it
+def initSurveyWorker(dataInterface, headerCache):
+    global WORKER_DATA_INTERFACE, WORKER_HEADER_CACHE
+    from pSashInterface import loadHessLibs
+    loadHessLibs()
+    WORKER_DATA_INTERFACE=dataInterface
+    WORKER_HEADER_CACHE=headerCache
+
+####################################
+## @brief Raw and zenith corrected trigger rates of a run, in a worker process
+#
+## @param run
+#  a run number
+## @return
+#  a tuple (table row, run header record), or (run, None, error message)
+#  if it failed
+def surveyRun(run):
+    from pTriggerRate import pTriggerRate
+    try:
+        trg=pTriggerRate(run, dataInterface=WORKER_DATA_INTERFACE,\
+                         headerCache=WORKER_HEADER_CACHE)
+        trg.computeTriggerRate()
+        trg.averageCorrectedTriggerRate()
+        record=trg.RunHeaderRecord
+        return ((run, record['Target'], record['Theta'], float(trg.AverageTriggerRate),\
+                 float(trg.AverageCorrectedTriggerRate)), record)
+    except (Exception, SystemExit) as e:
+        logger.error('Failed to get the trigger rate of run %s: %s'%(run, e))
+        return (run, None, str(e))
+
+####################################
+## @brief Class to get the trigger rates of a list of runs
+#
+class pTriggerSurvey(object):
+    ####################################
+    ## @brief Constructor
+    #
+    ## @param self
+    #  the object instance
+    ## @param runsList
+    #  a list of run numbers, None for all runs of the directory
+    ## @param directory
+    #  a directory with data files
+    ## @param nWorkers
+    #  number of worker processes
+    ## @param inventoryCache
+    #  the inventory cache file, None for no cache
+    ## @param headerCache
+    #  the run header cache file, None for no cache
+    def __init__(self, runsList=None, directory=HESS_DATA_DIR, nWorkers=4,\
+                 inventoryCache=LIDAR_INVENTORY_CACHE, headerCache=LIDAR_HEADER_CACHE):
+        self.NWorkers=nWorkers
+        # only this process writes the cache file
+        self.HeaderCache=pRunHeaderCache(headerCache, autoSave=False)
+        self.DataInterface=pDataInterface(runsList=[], directory=directory,\
+                                          inventoryCache=inventoryCache,\
+                                          fullScan=True if runsList is None else None)
+        if runsList is None:
+            runsList=sorted(self.DataInterface.AllRunsDict.keys())
+        self.DataInterface.addRuns(runsList)
+        ## Runs with both Lidar and Camera files
+        self.RunsList=sorted(self.DataInterface.RunsList)
+        ## Table rows (run, target, theta, raw rate, corrected rate)
+        self.Table=[]
+        ## Runs that failed, with the error message
+        self.FailedRuns={}
+
+    ####################################
+    ## @brief Get the trigger rates of all runs
+    #
+    ## @param self
+    #  the object instance
+    ## @return
+    #  the table rows, in run order
+    def process(self):
+        logger.info('Trigger rates of %d runs with %d workers'%(len(self.RunsList), self.NWorkers))
+        self.Table=[]
+        if len(self.RunsList)==0:
+            return self.Table
+        pool=multiprocessing.Pool(self.NWorkers, initializer=initSurveyWorker,\
+                                  initargs=(self.DataInterface, self.HeaderCache))
+        try:
+            chunkSize=max(1, min(16, len(self.RunsList)//(4*self.NWorkers)))
+            for result in pool.imap(surveyRun, self.RunsList, chunkSize):
+                if result[1] is None:
+                    self.FailedRuns[result[0]]=result[2]
+                    continue
+                (row, record)=result
+                self.Table.append(row)
+                self.HeaderCache.put([record])
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+            self.HeaderCache.save()
+        if len(self.FailedRuns)>0:
+            logger.warning('Failed runs: %s'%sorted(self.FailedRuns.keys()))
+        return self.Table
+
+    ####################################
+    ## @brief Write the table to a text file
+    #
+    ## @param self
+    #  the object instance
+    ## @param filename
+    #  the output file name
+    def writeTable(self, filename):
+        out=open(filename, 'w')
+        out.write('# %s\n'%' '.join(SURVEY_COLUMNS))
+        for row in self.Table:
+            out.write('%d %15s %6.02f %8.02f %8.02f\n'%row)
+        out.close()
+        logger.info('%d runs written to %s'%(len(self.Table), filename))
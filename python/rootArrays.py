@@ -0,0 +1,154 @@
+## @file
+#  Fast conversion of ROOT arrays to numpy arrays.
+#  ROOT arrays (TArrayD, TArrayF...) are wrapped through the buffer
+#  protocol, so that no element is copied one by one in python.
+#  This module does not import ROOT, any object with the same accessors
+#  can be used.
+#
+
+import numpy
+
+## numpy type of the ROOT array classes
+TARRAY_DTYPES={'TArrayD':'d', 'TArrayF':'f', 'TArrayL':'i8', 'TArrayI':'i4',\
+               'TArrayS':'i2', 'TArrayC':'i1'}
+
+####################################
+## @brief Get the numpy type of a ROOT array
+#
+## @param tarray
+#  a ROOT array
+## @return
+#  the numpy type, double if the class is not known
+def arrayDType(tarray):
+    if hasattr(tarray, 'ClassName'):
+        className=tarray.ClassName()
+    else:
+        className=type(tarray).__name__
+    return numpy.dtype(TARRAY_DTYPES.get(className, 'd'))
+
+####################################
+## @brief Get the size of a ROOT array
+#
+## @param tarray
+#  a ROOT array
+def arraySize(tarray):
+    if hasattr(tarray, 'GetSize'):
+        return int(tarray.GetSize())
+    return int(tarray.fN)
+
+####################################
+## @brief Wrap a buffer given by ROOT as a numpy array, without copy
+#
+## @param buf
+#  a PyROOT buffer, e.g. from TArrayD.GetArray() or TTree.GetV1()
+## @param size
+#  number of elements in the buffer
+## @param dtype
+#  numpy type of the elements
+def bufferToNumpy(buf, size, dtype='d'):
+    # PyROOT buffers do not know their length
+    if hasattr(buf, 'SetSize'):
+        buf.SetSize(size)
+    elif hasattr(buf, 'reshape') and not isinstance(buf, numpy.ndarray):
+        buf=buf.reshape((size,))
+    return numpy.frombuffer(buf, dtype=dtype, count=size)
+
+####################################
+## @brief Wrap a ROOT array as a numpy array
+#
+#  The memory of the ROOT array is used through the buffer of GetArray().
+#  If no buffer can be had, the elements are read one by one.
+#
+## @param tarray
+#  a ROOT array
+## @param copy
+#  return a copy, else a view that is only valid until the ROOT array
+#  is changed, e.g. when the next tree entry is read
+## @param dtype
+#  numpy type of the elements, None to guess it from the class name
+def tarrayToNumpy(tarray, copy=True, dtype=None):
+    if dtype is None:
+        dtype=arrayDType(tarray)
+    size=arraySize(tarray)
+    if size==0:
+        return numpy.zeros(0, dtype=dtype)
+    try:
+        array=bufferToNumpy(tarray.GetArray(), size, dtype)
+    except (AttributeError, TypeError, ValueError):
+        return numpy.fromiter((tarray[i] for i in range(size)), dtype=dtype, count=size)
+    if copy:
+        return array.copy()
+    return array
+
+####################################
+## @brief Read the Lidar profiles of a tree by chunks of entries
+#
+#  The chunk buffers are allocated once and filled again for each chunk,
+#  so that the memory used does not depend on the number of entries.
+#  The arrays given by a chunk are only valid until the next one is read.
+#
+## @param tree
+#  the Lidar tree, with a LidarEvent branch
+## @param chunkSize
+#  number of entries per chunk
+## @param entryTime
+#  function giving the time of an entry in seconds, None to use the
+#  entry number instead
+## @param entries
+#  list of entries to read, None for all entries
+## @return
+#  a generator of tuples (entries, times, range, signal 532 nm, signal 355 nm),
+#  the signals have one row per entry of the chunk
+def iterLidarChunks(tree, chunkSize=256, entryTime=None, entries=None):
+    if entries is None:
+        entries=range(int(tree.GetEntries()))
+    entries=numpy.asarray(entries, dtype='i8')
+    times=numpy.empty(chunkSize, dtype='d')
+    height=None
+    for start in range(0, entries.size, chunkSize):
+        chunk=entries[start:start+chunkSize]
+        for (row, entry) in enumerate(chunk):
+            entry=int(entry)
+            tree.GetEntry(entry)
+            event=tree.LidarEvent
+            green=tarrayToNumpy(event.GetSignal532(), copy=False)
+            blue=tarrayToNumpy(event.GetSignal355(), copy=False)
+            if height is None:
+                height=numpy.array(tarrayToNumpy(event.GetRange(), copy=False), dtype='d')
+                nPoints=height.size
+                wl1=numpy.empty((chunkSize, nPoints), dtype='d')
+                wl2=numpy.empty((chunkSize, nPoints), dtype='d')
+            if green.size!=nPoints or blue.size!=nPoints:
+                raise ValueError('Entry %d has %d points instead of %d'%\
+                                 (entry, min(green.size, blue.size), nPoints))
+            wl1[row]=green
+            wl2[row]=blue
+            if entryTime is None:
+                times[row]=entry
+            else:
+                times[row]=entryTime(entry)
+        nRows=chunk.size
+        yield (chunk, times[:nRows], height, wl1[:nRows], wl2[:nRows])
+
+####################################
+## @brief Read the Lidar profiles of many tree entries
+#
+#  All profiles are copied into 2-D arrays allocated once, with one
+#  memory copy per profile.
+#
+## @param tree
+#  the Lidar tree, with a LidarEvent branch
+## @param entries
+#  list of entries to read, None for all entries
+## @return
+#  a tuple (range, signal 532 nm, signal 355 nm), the signals have
+#  one row per entry
+def readLidarEntries(tree, entries=None):
+    if entries is None:
+        entries=range(int(tree.GetEntries()))
+    # a single chunk holding all entries
+    for (chunk, times, height, wl1, wl2) in iterLidarChunks(tree, max(len(entries), 1),\
+                                                            entries=entries):
+        return (height, wl1, wl2)
+    return (numpy.zeros(0, dtype='d'), numpy.zeros((0, 0), dtype='d'),\
+            numpy.zeros((0, 0), dtype='d'))
@@ -4,10 +4,53 @@
 
 import ROOT
 
+import os
 import math
+import numpy
 from datetime import datetime, timedelta
 
-from LidarRunDict import LIDAR_RUN_DICT
+from pRunSummaryStore import pRunSummaryStore, dateToEpoch
+
+## Directory of the run summary store, if not set the store is built
+#  in memory from LIDAR_RUN_DICT
+LIDAR_RUN_STORE=os.environ.get('LIDAR_RUN_STORE', None)
+
+## The run summary store, loaded on first use
+RUN_STORE=None
+
+####################################
+## @brief Get the run summary store
+#
+#  The store is memory mapped from LIDAR_RUN_STORE if it exists, else it is
+#  built once from LIDAR_RUN_DICT.
+def getRunStore():
+    global RUN_STORE
+    if RUN_STORE is None:
+        if LIDAR_RUN_STORE is not None and os.path.isdir(LIDAR_RUN_STORE):
+            RUN_STORE=pRunSummaryStore(LIDAR_RUN_STORE)
+        else:
+            # the dictionnary is big, only import it when there is no store
+            from LidarRunDict import LIDAR_RUN_DICT
+            RUN_STORE=pRunSummaryStore()
+            RUN_STORE.appendDict(LIDAR_RUN_DICT)
+    return RUN_STORE
+
+####################################
+## @brief Get the data file name of a run
+#
+## @param run
+#  the run number
+## @return
+#  the file name, relative to the data directory
+def getRunFileName(run):
+    store=getRunStore()
+    index=numpy.flatnonzero(store['RunNumber']==run)
+    if index.size==0:
+        raise KeyError('Run %d is not in the run summary'%run)
+    fileName=store['FileName'][index[0]]
+    if not isinstance(fileName, str):
+        fileName=fileName.decode('ascii')
+    return fileName
 
 ####################################
 ## @brief Simple estimate of the transmission
@@ -32,15 +75,9 @@ def getTransProb(tau1,tau2):
 ## @param Date
 #  start date and time as a string'%Y-%m-%d %H:%M:%S'
 def getRunsForNight(Date):
-    runNumbers=[]
-    date1=datetime.strptime(Date,'%Y-%m-%d %H:%M:%S')
-    date2=date1+timedelta(hours=16)
-    for key,val in LIDAR_RUN_DICT.items():
-        runDate=datetime.strptime(val['DateTime'],'%Y-%m-%d %H:%M:%S')
-        if runDate>=date1 and runDate<=date2 and val['IsGood']:
-            runNumbers.append(key)   
-    runNumbers.sort()
-    return runNumbers
+    time1=dateToEpoch(Date)
+    time2=time1+16*3600
+    return getRunStore().selectRuns(time1, time2, goodOnly=True)
 
 ####################################
 ## @brief Get run numbers for a given period,
@@ -52,13 +89,13 @@ def getRunsForNight(Date):
 #  stop date as a string'%Y-%m-%d %H:%M:%S'
 
 def getRunsFromTo(Date1,Date2):
-    runNumbers=[]
-    date1=datetime.strptime(Date1,'%Y-%m-%d %H:%M:%S')
-    date2=datetime.strptime(Date2,'%Y-%m-%d %H:%M:%S')
-    for key,val in LIDAR_RUN_DICT.items():
-        runDate=datetime.strptime(val['DateTime'],'%Y-%m-%d %H:%M:%S')
-        if runDate>=date1 and runDate<=date2:
-            runNumbers.append(key)
-    runNumbers.sort()
-    return runNumbers
+    return getRunStore().selectRuns(dateToEpoch(Date1), dateToEpoch(Date2))
 
+####################################
+## @brief Get the good runs of all nights,
+#  in the 16h windows of getRunsForNight
+#
+## @return
+#  a list of tuples (night start date, run numbers)
+def getAllNights():
+    return getRunStore().partitionNights(startHour=16, duration=16*3600, goodOnly=True)
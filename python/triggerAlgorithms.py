@@ -0,0 +1,99 @@
+## @file
+#  Trigger rate from the event time stamps, without ROOT histograms.
+#  Time stamps are counted in fixed width bins by chunks, and the averages
+#  are computed in closed form.
+#
+
+import numpy
+
+## Default binning, the same as the TH1F of pTriggerRate.fillRawTriggerRate
+TRIGGER_BINS=(4000, -2000., 1900.)
+
+####################################
+## @brief Count time stamps in bins
+#
+#  Bins are [xMin+i*width, xMin+(i+1)*width), as for a ROOT histogram,
+#  and entries outside of [xMin, xMax) are not counted.
+#
+## @param times
+#  time stamps in seconds from the run start
+## @param counts
+#  integer array with one element per bin, incremented in place
+## @param xMin
+#  lower edge of the first bin
+## @param xMax
+#  upper edge of the last bin
+## @return
+#  the number of time stamps counted
+def countTimes(times, counts, xMin=TRIGGER_BINS[1], xMax=TRIGGER_BINS[2]):
+    nBins=counts.size
+    times=numpy.asarray(times, dtype='d')
+    index=numpy.floor(nBins*(times-xMin)/(xMax-xMin)).astype('i8')
+    index=index[(index>=0)&(index<nBins)]
+    counts+=numpy.bincount(index, minlength=nBins)
+    return index.size
+
+####################################
+## @brief Count chunks of time stamps in bins
+#
+#  Only one chunk is in memory at a time.
+#
+## @param chunks
+#  an iterable of time stamp arrays, in seconds from the run start
+## @param nBins
+#  number of bins
+## @param xMin
+#  lower edge of the first bin
+## @param xMax
+#  upper edge of the last bin
+## @return
+#  the counts per bin
+def countTimeChunks(chunks, nBins=TRIGGER_BINS[0], xMin=TRIGGER_BINS[1],\
+                    xMax=TRIGGER_BINS[2]):
+    counts=numpy.zeros(nBins, dtype='i8')
+    for times in chunks:
+        countTimes(times, counts, xMin, xMax)
+    return counts
+
+####################################
+## @brief Average of the counts per bin as a fit with a constant
+#
+#  A chi2 fit with pol0, with errors sqrt(n) and the empty bins left out
+#  as ROOT does, gives the harmonic mean of the non empty bins.
+#
+## @param counts
+#  the counts per bin
+## @return
+#  the fitted constant, 0 if all bins are empty
+def fitConstantRate(counts):
+    counts=numpy.asarray(counts, dtype='d')
+    filled=counts[counts>0]
+    if filled.size==0:
+        return 0.
+    return filled.size/numpy.sum(1./filled)
+
+####################################
+## @brief Mean of the counts over the bins between the first and last event
+#
+## @param counts
+#  the counts per bin
+## @return
+#  the mean counts per bin, 0 if all bins are empty
+def meanRate(counts):
+    filled=numpy.flatnonzero(counts)
+    if filled.size==0:
+        return 0.
+    return numpy.sum(counts)/float(filled[-1]-filled[0]+1)
+
+####################################
+## @brief Moving average of the counts
+#
+## @param counts
+#  the counts per bin
+## @param window
+#  number of bins to average
+## @return
+#  the average over bins [i, i+window) for each i, len(counts)-window+1 values
+def rollingRate(counts, window=60):
+    cumCounts=numpy.concatenate(([0], numpy.cumsum(counts)))
+    return (cumCounts[window:]-cumCounts[:-window])/float(window)
@@ -0,0 +1,84 @@
+#!/bin/env python
+
+## @file
+#  Benchmark the bulk ascii parser against the former line by line parser
+#  on synthetic Lidar files of 10^4 to 10^6 lines.
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy
+from datetime import datetime
+
+from pLidarRun import loadTxtData
+
+####################################
+## @brief Former line by line parser, kept here as a reference
+#
+## @param filename
+#  a text file name with Lidar data
+def loopTxtData(filename):
+    cont=open(filename,'r').readlines()
+    dateTime=datetime.strptime(cont[0].strip(),'%a %b %d %H:%M:%S %Y')
+    nPoints=len(cont[1:])
+    rawData=numpy.ndarray((nPoints,3),'d')
+    i=0
+    for l in cont[1:]:
+        data=l.split()
+        rawData[i]=(float(data[0]),float(data[1]),float(data[2]))
+        i+=1
+    return (dateTime, rawData)
+
+####################################
+## @brief Write a fake Lidar file
+#
+## @param filename
+#  output file name
+## @param nLines
+#  number of data lines
+def writeFakeFile(filename, nLines):
+    alt=numpy.arange(1,nLines+1)*(30./nLines)
+    wl1=-numpy.exp(-alt/8.)/alt**2+numpy.random.normal(0,2e-4,nLines)
+    wl2=-numpy.exp(-alt/4.)/alt**2+numpy.random.normal(0,2e-4,nLines)
+    out=open(filename,'w')
+    out.write('Thu Jun 30 19:41:51 2011\n')
+    numpy.savetxt(out, numpy.column_stack((alt,wl1,wl2)), fmt='%.4f %.6e %.6e')
+    out.close()
+
+####################################
+## @brief Time a parser
+#
+## @param parser
+#  the parsing function
+## @param filename
+#  the file to parse
+## @param nRepeat
+#  keep the best of nRepeat calls
+def timeParser(parser, filename, nRepeat=3):
+    best=None
+    for i in range(nRepeat):
+        start=time.time()
+        result=parser(filename)
+        elapsed=time.time()-start
+        if best is None or elapsed<best:
+            best=elapsed
+    return best, result
+
+
+if __name__ == '__main__':
+    tmpDir=tempfile.mkdtemp(prefix='lidarbench')
+    print('%10s %12s %12s %8s %s'%('Lines','Loop (s)','Bulk (s)','Speedup','Identical'))
+    try:
+        for nLines in [10**4, 10**5, 10**6]:
+            filename=os.path.join(tmpDir,'run_%06d_Lidar_001.root.txt'%nLines)
+            writeFakeFile(filename, nLines)
+            tLoop,(date1,data1)=timeParser(loopTxtData, filename)
+            tBulk,(date2,data2)=timeParser(loadTxtData, filename)
+            same=(date1==date2) and numpy.array_equal(data1,data2)
+            print('%10d %12.4f %12.4f %8.1f %s'%(nLines,tLoop,tBulk,tLoop/tBulk,same))
+            if not same:
+                sys.exit(1)
+    finally:
+        shutil.rmtree(tmpDir)
@@ -2,6 +2,7 @@
 import glob
 import os
 from pLidarRun import pLidarRun
+from pLidarBatch import pLidarBatch
 from toolBox import *
 
 DATA_DIR='/home/bregeon/CTA/Lidar'
@@ -19,11 +20,18 @@ runList=glob.glob('%s/alldata/run*.root.txt'%DATA_DIR)
 
 runList.sort()
 
-sDict=['LIDAR_RUN_DICT={\n']
-for run in runList:
+# all runs sharing the same range grid are analysed at once
+batch=pLidarBatch(runList, process=True, nBins=100)
+entries=batch.dumpToDict()
+# the few others one by one, unreadable files are tried again so that
+# a bad file fails loudly instead of missing from the dictionnary
+for run in batch.RejectedFiles+batch.FailedFiles:
     p=pLidarRun(run, process=True, nBins=100)
     p.calcTau4()
-    sDict.append(p.dumpToDict())
+    entries.append(p.dumpToDict())
+entries.sort(key=lambda entry: int(entry.split(':')[0]))
+
+sDict=['LIDAR_RUN_DICT={\n']+entries
 sDict.append('}')
 
 open('LidarRunDict.py','w').writelines(sDict)
@@ -0,0 +1,32 @@
+#!/bin/env python
+import glob
+import argparse
+from pRunDictBuilder import pRunDictBuilder, scalingReport
+
+DATA_DIR='/home/bregeon/CTA/Lidar'
+
+parser=argparse.ArgumentParser(description='Rebuild LidarRunDict.py in parallel')
+parser.add_argument('-d', '--data-dir', default='%s/alldata'%DATA_DIR,\
+                    help='directory with the run*.root.txt files')
+parser.add_argument('-j', '--jobs', type=int, default=4, help='number of worker processes')
+parser.add_argument('-o', '--output', default='LidarRunDict.py', help='output file')
+parser.add_argument('-n', '--nbins', type=int, default=100, help='number of bins')
+parser.add_argument('--log-dir', default=None, help='directory for the worker log files')
+parser.add_argument('-i', '--incremental', action='store_true',\
+                    help='only process new or modified runs')
+parser.add_argument('--hash', action='store_true',\
+                    help='compare file contents, not only size and modification time')
+parser.add_argument('--scaling', action='store_true',\
+                    help='report the throughput from 1 to JOBS workers instead')
+args=parser.parse_args()
+
+runList=glob.glob('%s/run*.root.txt'%args.data_dir)
+
+if args.scaling:
+    print('%8s %10s %10s %8s'%('Workers','Time (s)','Runs/s','Speedup'))
+    for (nWorkers, elapsed, rate, speedup) in scalingReport(runList, args.jobs, args.nbins):
+        print('%8d %10.2f %10.1f %8.2f'%(nWorkers, elapsed, rate, speedup))
+else:
+    builder=pRunDictBuilder(runList, args.output, nWorkers=args.jobs, nBins=args.nbins,\
+                            logDir=args.log_dir, useHash=args.hash)
+    builder.build(incremental=args.incremental)
@@ -23,7 +23,7 @@ runList=[]
 runNumbers=getRunsForNight(date)
 for run in runNumbers:
   #if run%3==0:
-    runList.append(os.path.join(DATA_DIR,LIDAR_RUN_DICT[run]['FileName']))
+    runList.append(os.path.join(DATA_DIR,getRunFileName(run)))
     
 
 # Analyze data and prepare plots
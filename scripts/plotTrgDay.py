@@ -23,10 +23,12 @@ for adir in runsDir[2:]:
 #    targetsList.append(str(si.getRunNum())+' '+str(si.RunHeader.GetTarget()))
     targetsList.append(si.getSummaryString())
 
+# hash the data directory only once for all runs
+dataInterface=pDataInterface(runsList=[int(adir.split('/run0')[1]) for adir in runsDir[2:]])
 for adir in runsDir[2:]:
     run=int(adir.split('/run0')[1])
-    trg=pTriggerRate(run)
-    trg.fillRawTriggerRate()
+    trg=pTriggerRate(run, dataInterface=dataInterface)
+    trg.computeTriggerRate()
     trgList.append(trg)    
     
 n=len(trgList)
@@ -0,0 +1,17 @@
+#!/bin/env python
+import argparse
+from pDataInterface import HESS_DATA_DIR
+from pTriggerSurvey import pTriggerSurvey
+
+parser=argparse.ArgumentParser(description='Raw and zenith corrected trigger rates of many runs')
+parser.add_argument('runs', type=int, nargs='*', help='run numbers, all runs if none')
+parser.add_argument('-d', '--data-dir', default=HESS_DATA_DIR,\
+                    help='directory with the run* directories')
+parser.add_argument('-j', '--jobs', type=int, default=4, help='number of worker processes')
+parser.add_argument('-o', '--output', default='TriggerRates.txt', help='output table')
+args=parser.parse_args()
+
+survey=pTriggerSurvey(args.runs if len(args.runs)>0 else None, directory=args.data_dir,\
+                      nWorkers=args.jobs)
+survey.process()
+survey.writeTable(args.output)
@@ -0,0 +1,21 @@
+#!/bin/env python
+import argparse
+from pDataInterface import HESS_DATA_DIR
+from pRunSummaryStore import pRunSummaryStore
+from pLidarWatcher import pLidarWatcher
+
+parser=argparse.ArgumentParser(description='Analyse new Lidar runs as soon as they are on disk')
+parser.add_argument('-d', '--data-dir', default=HESS_DATA_DIR,\
+                    help='directory with the run* directories')
+parser.add_argument('-s', '--store', required=True, help='run summary store directory')
+parser.add_argument('-p', '--poll', type=float, default=2., help='seconds between two polls')
+parser.add_argument('--settle', type=float, default=2.,\
+                    help='seconds without change for a file to be complete')
+parser.add_argument('--lookback', type=float, default=12.,\
+                    help='hours, older run directories are not watched')
+parser.add_argument('-n', '--nbins', type=int, default=100, help='number of bins')
+args=parser.parse_args()
+
+watcher=pLidarWatcher(args.data_dir, pRunSummaryStore(args.store), pollInterval=args.poll,\
+                      settleTime=args.settle, lookback=args.lookback*3600, nBins=args.nbins)
+watcher.watch()